@@ -0,0 +1,202 @@
+"""Seed a dataset and time every order API route.
+
+    python -m benchmarks.api --orders 10000
+    BENCH_DATABASE=postgres python -m benchmarks.api --orders 1000000 --keepdb
+
+Orders and lines are built with order.factories and bulk inserted. With
+--keepdb a seeded database is reused when it already holds the requested
+number of orders. Requests go through the full Django stack in-process
+(django.test.Client), so the numbers are server time without the network.
+Writes run inside a rolled-back transaction so every route sees the same
+data. Results are printed and saved as JSON; diff two runs with
+benchmarks.compare.
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+from benchmarks.utils import setup_django, summarize, test_database
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+SEED_BATCH = 5000
+
+
+def seed(orders, lines_per_order, days, products=50):
+    from order import rollup, totals
+    from order.factories import OrderFactory, ProductFactory
+    from order.models import Order, Product, Quantity
+
+    Product.objects.bulk_create(ProductFactory.build(img='dish.jpg', description='Dish') for _ in range(products))
+    product_ids = list(Product.objects.values_list('pk', flat=True))
+    prices = dict(Product.objects.values_list('pk', 'price'))
+    states = [Order.State.ORDERING, Order.State.CHECKING, Order.State.PAID, Order.State.PAID]
+    first_day = date.today() - timedelta(days=days - 1)
+
+    for start in range(0, orders, SEED_BATCH):
+        size = min(SEED_BATCH, orders - start)
+        batch = Order.objects.bulk_create(
+            OrderFactory.build(
+                table_id=n % 40,
+                # Customer ids stay unique so the open-order constraint holds.
+                customer_id=n,
+                waiter_id=n % 12 + 1,
+                state=states[n % len(states)],
+                percentage_tip=n % 3 * 5,
+            )
+            for n in range(start, start + size)
+        )
+        ids = [order.pk for order in batch]
+        # auto_now_add pins date_created to today; spread batches over the range.
+        Order.objects.filter(pk__in=ids).update(date_created=first_day + timedelta(days=start * days // orders))
+        Quantity.objects.bulk_create(
+            Quantity(order_id=order_id, product_id=product_id, quantity=1 + n % 3, price=prices[product_id])
+            for n, order_id in enumerate(ids)
+            for product_id in product_ids[n % len(product_ids):][:lines_per_order]
+        )
+    totals.recompute_all()
+    rollup.rebuild()
+
+
+def routes(first_day, last_day):
+    from order.models import Order, Product, Quantity
+
+    order = Order.objects.order_by('pk').first()
+    product = Product.objects.order_by('pk').first()
+    line = Quantity.objects.order_by('pk').first()
+    open_order = Order.objects.filter(state=Order.State.ORDERING).order_by('pk').first()
+    week = {'start_date': (last_day - timedelta(days=6)).isoformat(), 'end_date': last_day.isoformat()}
+    oldest_day = {'start_date': first_day.isoformat(), 'end_date': first_day.isoformat()}
+
+    # name, method, path, body, heavy (full-table response), write
+    return [
+        ('product-list', 'get', '/api/products/', None, False, False),
+        ('product-detail', 'get', f'/api/products/{product.pk}/', None, False, False),
+        ('order-list', 'get', '/api/orders/', None, True, False),
+        ('order-detail', 'get', f'/api/orders/{order.pk}/', None, False, False),
+        ('order-nested', 'get', f'/api/orders/{order.pk}/nested/', None, False, False),
+        ('quantity-list', 'get', '/api/quantity/', None, True, False),
+        ('quantity-detail', 'get', f'/api/quantity/{line.pk}/', None, False, False),
+        ('order-create', 'post', '/api/orders/', {'number': 1, 'table_id': 999, 'customer_id': 10 ** 9}, False, True),
+        ('quantity-create', 'post', '/api/quantity/', {'order': open_order.pk, 'product': product.pk}, False, True),
+        ('quantity-bulk', 'post', '/api/quantity/bulk/', {
+            'order': open_order.pk, 'lines': [{'product': product.pk, 'quantity': 1}] * 10,
+        }, False, True),
+        ('order-filter', 'post', '/api/filter/', week, True, False),
+        ('order-filter-page', 'post', '/api/filter/', dict(week, page_size=100), False, False),
+        ('order-filter-stream', 'post', '/api/filter/', dict(week, stream=True), True, False),
+        ('order-delete', 'post', '/api/delete/', oldest_day, True, True),
+        ('metrics', 'get', '/api/metrics/', None, False, False),
+        ('async-product-list', 'get', '/api/async/products/', None, False, False),
+        ('async-order-detail', 'get', f'/api/async/orders/{order.pk}/', None, False, False),
+        ('async-order-filter-page', 'post', '/api/async/filter/', dict(week, page_size=100), False, False),
+    ]
+
+
+def request(client, method, path, body):
+    if method == 'get':
+        response = client.get(path, HTTP_ACCEPT='application/json')
+    else:
+        response = client.post(path, json.dumps(body), content_type='application/json', HTTP_ACCEPT='application/json')
+    if response.streaming:
+        for _ in response.streaming_content:
+            pass
+    if response.status_code >= 400:
+        raise RuntimeError(f'{method.upper()} {path} returned {response.status_code}')
+
+
+def run_route(client, spec, runs):
+    from django.db import transaction
+
+    name, method, path, body, heavy, write = spec
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        if write:
+            with transaction.atomic():
+                request(client, method, path, body)
+                transaction.set_rollback(True)
+        else:
+            request(client, method, path, body)
+        samples.append(time.perf_counter() - start)
+    result = summarize(samples)
+    result['throughput_rps'] = len(samples) / sum(samples)
+    return result
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_ROOT, text=True, stderr=subprocess.DEVNULL
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--orders', type=int, default=10000, help='e.g. 10000, 100000 or 1000000')
+    parser.add_argument('--lines-per-order', type=int, default=3)
+    parser.add_argument('--days', type=int, default=90)
+    parser.add_argument('--runs', type=int, default=50, help='requests per route')
+    parser.add_argument('--heavy-runs', type=int, default=3, help='requests per full-table route')
+    parser.add_argument('--routes', help='comma-separated route names to run (default: all)')
+    parser.add_argument('--keepdb', action='store_true', help='keep and reuse the seeded database')
+    parser.add_argument('--output', help='JSON results path (default: bench_results/<commit>-<orders>.json)')
+    args = parser.parse_args()
+
+    setup_django('benchmarks.settings')
+    import django
+    from django.conf import settings
+    from django.db import connection
+    from django.test import Client
+
+    from order.models import Order
+
+    with test_database(keepdb=args.keepdb):
+        if Order.objects.count() != args.orders:
+            Order.objects.all().delete()
+            start = time.perf_counter()
+            seed(args.orders, args.lines_per_order, args.days)
+            print(f'Seeded {args.orders} orders in {time.perf_counter() - start:.1f}s')
+
+        last_day = date.today()
+        first_day = last_day - timedelta(days=args.days - 1)
+        wanted = set(args.routes.split(',')) if args.routes else None
+        client = Client()
+        results = {}
+        for spec in routes(first_day, last_day):
+            if wanted and spec[0] not in wanted:
+                continue
+            results[spec[0]] = result = run_route(client, spec, args.heavy_runs if spec[4] else args.runs)
+            print(f"{spec[0]:<24} {result['throughput_rps']:9.1f} req/s  p50 {result['p50_ms']:8.2f} ms  p99 {result['p99_ms']:8.2f} ms")
+
+        commit = git_commit()
+        report = {
+            'meta': {
+                'commit': commit,
+                'orders': args.orders,
+                'lines_per_order': args.lines_per_order,
+                'database': connection.vendor,
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'values_lists': settings.ORDER_API_VALUES_LISTS,
+                'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            },
+            'routes': results,
+        }
+
+    output = args.output or f'bench_results/{commit or "unknown"}-{args.orders}.json'
+    os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+    with open(output, 'w') as handle:
+        json.dump(report, handle, indent=2)
+    print(f'Wrote {output}')
+
+
+if __name__ == '__main__':
+    main()
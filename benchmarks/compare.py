@@ -0,0 +1,34 @@
+"""Diff two benchmarks.api result files.
+
+    python -m benchmarks.compare bench_results/abc123-10000.json bench_results/def456-10000.json
+"""
+import argparse
+import json
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('baseline')
+    parser.add_argument('candidate')
+    parser.add_argument('--metric', default='p50_ms', choices=['mean_ms', 'p50_ms', 'p99_ms'])
+    parser.add_argument('--threshold', type=float, default=10.0, help='percent change to flag')
+    args = parser.parse_args()
+
+    with open(args.baseline) as handle:
+        baseline = json.load(handle)
+    with open(args.candidate) as handle:
+        candidate = json.load(handle)
+
+    print(f"{baseline['meta']['commit']} -> {candidate['meta']['commit']} ({args.metric})")
+    for route, before in baseline['routes'].items():
+        after = candidate['routes'].get(route)
+        if after is None:
+            continue
+        old, new = before[args.metric], after[args.metric]
+        change = (new - old) / old * 100 if old else 0.0
+        flag = '  REGRESSION' if change > args.threshold else ''
+        print(f'{route:<24} {old:9.2f} -> {new:9.2f} ms  {change:+6.1f}%{flag}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+"""Drive a running server with increasing concurrency and report where it tops out.
+
+Start the same project under both interfaces, e.g.
+
+    gunicorn waiter.wsgi -w 4 --threads 1 -b :8001
+    uvicorn waiter.asgi:application --workers 4 --port 8002
+
+then compare the sync and async read paths:
+
+    python -m benchmarks.http_load http://localhost:8001 /api/orders/
+    python -m benchmarks.http_load http://localhost:8002 /api/async/orders/
+
+Throughput that stops growing as concurrency rises, while p99 climbs, is the
+server's concurrency limit.
+"""
+import argparse
+import json
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.utils import summarize
+
+
+def fetch(url, body=None):
+    start = time.perf_counter()
+    request = urllib.request.Request(url, data=body, headers={'Accept': 'application/json', 'Content-Type': 'application/json'})
+    with urllib.request.urlopen(request) as response:
+        response.read()
+    return time.perf_counter() - start
+
+
+def run_level(url, concurrency, requests, body=None):
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        samples = list(pool.map(lambda _: fetch(url, body), range(requests)))
+    elapsed = time.perf_counter() - start
+    return dict(summarize(samples), concurrency=concurrency, throughput_rps=requests / elapsed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('base_url')
+    parser.add_argument('path')
+    parser.add_argument('--levels', default='1,8,32,64,128,256')
+    parser.add_argument('--requests', type=int, default=500, help='requests per concurrency level')
+    parser.add_argument('--body', help='JSON body; sends a POST instead of a GET')
+    parser.add_argument('--output', help='write results as JSON to this file')
+    args = parser.parse_args()
+
+    url = args.base_url.rstrip('/') + args.path
+    body = args.body.encode() if args.body else None
+    results = []
+    for level in (int(value) for value in args.levels.split(',')):
+        result = run_level(url, level, args.requests, body)
+        results.append(result)
+        print(f"c={level:<4} {result['throughput_rps']:8.1f} req/s  p50 {result['p50_ms']:7.1f} ms  p99 {result['p99_ms']:7.1f} ms")
+
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump({'url': url, 'results': results}, output, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+"""Measure list payload size and render time across response options.
+
+    python -m benchmarks.payload --products 2000 --orders 20000
+
+For the product and order lists, each variant (all fields, a sparse
+?fields= set, the columns + rows layout) is rendered with the json module
+and with orjson (when installed). Sizes are reported raw, gzipped and, when
+the brotli package is installed, brotli-compressed at the quality the
+middleware uses.
+"""
+import argparse
+import gzip
+import json
+
+from benchmarks.utils import setup_django, summarize, test_database, timed
+
+VARIANTS = {
+    'products': [
+        ('all fields', {}),
+        ('fields=id,name,price', {'fields': 'id,name,price'}),
+        ('columns', {'layout': 'columns'}),
+        ('fields + columns', {'fields': 'id,name,price', 'layout': 'columns'}),
+    ],
+    'orders': [
+        ('all fields', {}),
+        ('fields=id,number,state,total_check', {'fields': 'id,number,state,total_check'}),
+        ('columns', {'layout': 'columns'}),
+    ],
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--products', type=int, default=2000)
+    parser.add_argument('--orders', type=int, default=20000)
+    parser.add_argument('--repeat', type=int, default=10)
+    args = parser.parse_args()
+
+    setup_django('benchmarks.settings')
+    from django.conf import settings
+    from django.test import Client
+
+    from order import renderers
+    from order.compression import brotli
+    from order.factories import OrderFactory, ProductFactory
+    from order.models import Order, Product
+
+    with test_database():
+        Product.objects.bulk_create(
+            ProductFactory.build(img=f'https://cdn.example.com/dishes/{n}.jpg', description='Slow-cooked and served warm. ' * 8)
+            for n in range(args.products)
+        )
+        Order.objects.bulk_create(OrderFactory.build(table_id=n, customer_id=n) for n in range(args.orders))
+
+        client = Client()
+        orjson = renderers.orjson
+        results = []
+        for resource, variants in VARIANTS.items():
+            for name, params in variants:
+                # Rendering is timed on the view's data, without the database.
+                response = client.get(f'/api/{resource}/', params, HTTP_ACCEPT='application/json')
+                data, context = response.data, response.renderer_context
+                renderer = renderers.CompactJSONRenderer()
+                result = {'resource': resource, 'variant': name}
+                for encoder, module in (('json', None), ('orjson', orjson)):
+                    if encoder == 'orjson' and module is None:
+                        continue
+                    renderers.orjson = module
+                    result[f'{encoder}_render'] = summarize(
+                        timed(lambda: renderer.render(data, 'application/json', context), args.repeat)
+                    )
+                renderers.orjson = orjson
+                body = response.content
+                result['bytes'] = len(body)
+                result['gzip_bytes'] = len(gzip.compress(body))
+                if brotli is not None:
+                    result['brotli_bytes'] = len(brotli.compress(body, quality=settings.ORDER_BROTLI_QUALITY))
+                results.append(result)
+                print(
+                    f"{resource:<9} {name:<36} {result['bytes']:>10} B  gzip {result['gzip_bytes']:>9} B  "
+                    f"json {result['json_render']['mean_ms']:8.2f} ms"
+                    + (f"  orjson {result['orjson_render']['mean_ms']:8.2f} ms" if 'orjson_render' in result else '')
+                )
+        print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,50 @@
+"""Compare ModelSerializer list rendering with the values_list() fast path.
+
+    python -m benchmarks.serialization --rows 10000
+"""
+import argparse
+import json
+
+from benchmarks.utils import setup_django, summarize, test_database, timed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=10)
+    args = parser.parse_args()
+
+    setup_django()
+    from rest_framework.renderers import JSONRenderer
+
+    from order import fastpath
+    from order.factories import OrderFactory
+    from order.models import Order
+    from order.serilizers import OrderSerializer
+
+    with test_database():
+        Order.objects.bulk_create(
+            OrderFactory.build(table_id=n, customer_id=n) for n in range(args.rows)
+        )
+        queryset = Order.objects.all()
+        renderer = JSONRenderer()
+        plan = fastpath.compile_serializer(OrderSerializer)
+
+        def serializer_path():
+            return renderer.render(OrderSerializer(queryset.all(), many=True).data)
+
+        def values_path():
+            return renderer.render(fastpath.serialize_rows(plan, queryset.all()))
+
+        assert serializer_path() == values_path()
+        results = {
+            'rows': args.rows,
+            'serializer': summarize(timed(serializer_path, args.repeat)),
+            'values_list': summarize(timed(values_path, args.repeat)),
+        }
+        results['speedup'] = results['serializer']['mean_ms'] / results['values_list']['mean_ms']
+        print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,32 @@
+import os
+import tempfile
+
+from waiter.settings import *
+
+# SQLite by default; BENCH_DATABASE=postgres uses a local server configured
+# through the usual PG* environment variables.
+if os.environ.get('BENCH_DATABASE') == 'postgres':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get('PGDATABASE', 'waiter_bench'),
+            'USER': os.environ.get('PGUSER', 'postgres'),
+            'PASSWORD': os.environ.get('PGPASSWORD', ''),
+            'HOST': os.environ.get('PGHOST', 'localhost'),
+            'PORT': os.environ.get('PGPORT', '5432'),
+        },
+    }
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.environ.get('BENCH_SQLITE_PATH', 'bench.sqlite3'),
+            'TEST': {'NAME': os.environ.get('BENCH_SQLITE_PATH', 'bench.sqlite3')},
+        },
+    }
+
+DEBUG = False
+
+ALLOWED_HOSTS = ['*']
+
+ORDER_ARCHIVE_DIR = Path(tempfile.mkdtemp(prefix='waiter-bench-archive-'))
@@ -0,0 +1,3 @@
+from waiter.settings_api import *
+
+from benchmarks.settings import DATABASES, DEBUG, ALLOWED_HOSTS, ORDER_ARCHIVE_DIR  # noqa: F401
@@ -0,0 +1,90 @@
+"""Measure cold-start cost of each WSGI entry point / settings profile.
+
+    python -m benchmarks.startup --runs 10
+
+Every run is a fresh interpreter that imports the entry module and serves
+one request by calling the WSGI callable directly. The path defaults to the
+metrics endpoint so no database has to exist; pass --path to include the
+first query as well.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+from benchmarks.utils import summarize
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+PROFILES = {
+    'full': ('waiter.wsgi', 'benchmarks.settings'),
+    'api': ('waiter.wsgi_api', 'benchmarks.settings_api'),
+}
+
+PROBE = '''
+import importlib, io, json, sys, time
+start = time.perf_counter()
+module = importlib.import_module(sys.argv[1])
+imported = time.perf_counter()
+status = []
+environ = {
+    'REQUEST_METHOD': 'GET', 'PATH_INFO': sys.argv[2], 'QUERY_STRING': '',
+    'SERVER_NAME': 'localhost', 'SERVER_PORT': '80', 'HTTP_HOST': 'localhost',
+    'HTTP_ACCEPT': 'application/json', 'wsgi.input': io.BytesIO(), 'wsgi.errors': sys.stderr,
+    'wsgi.url_scheme': 'http', 'wsgi.version': (1, 0), 'wsgi.multithread': False,
+    'wsgi.multiprocess': True, 'wsgi.run_once': False,
+}
+b''.join(module.application(environ, lambda code, headers, exc_info=None: status.append(code)))
+served = time.perf_counter()
+print(json.dumps({
+    'import_ms': (imported - start) * 1000,
+    'first_response_ms': (served - start) * 1000,
+    'modules': len(sys.modules),
+    'status': status[0],
+}))
+'''
+
+
+def probe(entry, settings_module, path):
+    env = dict(os.environ, DJANGO_SETTINGS_MODULE=settings_module, PYTHONPATH=str(REPO_ROOT))
+    start = time.perf_counter()
+    output = subprocess.check_output([sys.executable, '-c', PROBE, entry, path], env=env, cwd=REPO_ROOT, text=True)
+    result = json.loads(output.strip().splitlines()[-1])
+    result['process_ms'] = (time.perf_counter() - start) * 1000
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--path', default='/api/metrics/')
+    parser.add_argument('--output', help='write results as JSON to this file')
+    args = parser.parse_args()
+
+    report = {}
+    for name, (entry, settings_module) in PROFILES.items():
+        runs = [probe(entry, settings_module, args.path) for _ in range(args.runs)]
+        report[name] = {
+            'entry': entry,
+            'status': runs[0]['status'],
+            'modules': runs[0]['modules'],
+            'import': summarize([run['import_ms'] / 1000 for run in runs]),
+            'first_response': summarize([run['first_response_ms'] / 1000 for run in runs]),
+            'process': summarize([run['process_ms'] / 1000 for run in runs]),
+        }
+        print(
+            f"{name:<5} {entry:<16} import p50 {report[name]['import']['p50_ms']:7.1f} ms  "
+            f"first response p50 {report[name]['first_response']['p50_ms']:7.1f} ms  "
+            f"{report[name]['modules']} modules  ({report[name]['status']})"
+        )
+
+    if args.output:
+        with open(args.output, 'w') as handle:
+            json.dump(report, handle, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,120 @@
+"""Compare order state changes under contention: full PUT vs transition actions.
+
+Start a server against a scratch database, then
+
+    python -m benchmarks.transitions http://localhost:8001 --orders 200 --concurrency 32
+
+For each order two clients race: one edits the tip with a PATCH, the other
+moves the order to CHECKING, either by reading it and PUTting it back with the
+new state (the old path) or with POST /api/orders/<id>/check/. Reported per
+path: throughput of the state changes, their latency, and how many tip edits
+were lost because a PUT wrote back the stale value. Use Postgres for the
+server: SQLite serialises writers and fails some of them with "database is
+locked" at any real concurrency.
+"""
+import argparse
+import json
+import random
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.utils import summarize
+
+WRITABLE = ('number', 'table_id', 'customer_id', 'waiter_id', 'state', 'percentage_tip', 'date_paid')
+
+
+def call(base_url, method, path, body=None):
+    data = json.dumps(body).encode() if body is not None else None
+    request = urllib.request.Request(base_url + path, data=data, method=method, headers={
+        'Accept': 'application/json', 'Content-Type': 'application/json',
+    })
+    try:
+        with urllib.request.urlopen(request) as response:
+            return response.status, json.loads(response.read() or b'null')
+    except urllib.error.HTTPError as error:
+        return error.code, None
+
+
+def create_orders(base_url, count):
+    # Fresh table/customer ids so the open-order constraint never trips.
+    base = random.randrange(10 ** 6, 10 ** 9)
+    return [
+        call(base_url, 'POST', '/api/orders/', {'number': n, 'table_id': base, 'customer_id': base + n})[1]['id']
+        for n in range(count)
+    ]
+
+
+def put_state(base_url, order_id):
+    _, order = call(base_url, 'GET', f'/api/orders/{order_id}/')
+    body = {field: order[field] for field in WRITABLE}
+    body['state'] = '2'
+    return call(base_url, 'PUT', f'/api/orders/{order_id}/', body)[0]
+
+
+def post_check(base_url, order_id):
+    return call(base_url, 'POST', f'/api/orders/{order_id}/check/')[0]
+
+
+def edit_tip(base_url, order_id):
+    return call(base_url, 'PATCH', f'/api/orders/{order_id}/', {'percentage_tip': 15})[0]
+
+
+def run_path(base_url, name, change_state, orders, concurrency):
+    order_ids = create_orders(base_url, orders)
+    jobs = [(change_state, order_id) for order_id in order_ids] + [(edit_tip, order_id) for order_id in order_ids]
+    random.shuffle(jobs)
+
+    def job(spec):
+        func, order_id = spec
+        start = time.perf_counter()
+        status = func(base_url, order_id)
+        return func is change_state, order_id, status, time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(job, jobs))
+    elapsed = time.perf_counter() - start
+
+    samples = [seconds for is_state, _, _, seconds in results if is_state]
+    failed = sum(1 for is_state, _, status, _ in results if status != 200)
+    # Only tip edits that were acknowledged count as lost.
+    edited = {order_id for is_state, order_id, status, _ in results if not is_state and status == 200}
+    final = [call(base_url, 'GET', f'/api/orders/{order_id}/')[1] for order_id in edited]
+    return dict(
+        summarize(samples),
+        path=name,
+        throughput_rps=len(jobs) / elapsed,
+        failed_requests=failed,
+        lost_tip_edits=sum(1 for order in final if order['percentage_tip'] != 15),
+        acknowledged_tip_edits=len(edited),
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('base_url')
+    parser.add_argument('--orders', type=int, default=200)
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--output', help='write results as JSON to this file')
+    args = parser.parse_args()
+
+    base_url = args.base_url.rstrip('/')
+    results = []
+    for name, change_state in (('put', put_state), ('transition', post_check)):
+        result = run_path(base_url, name, change_state, args.orders, args.concurrency)
+        results.append(result)
+        print(
+            f"{name:<10} {result['throughput_rps']:8.1f} req/s  p50 {result['p50_ms']:7.1f} ms  "
+            f"p99 {result['p99_ms']:7.1f} ms  lost tip edits {result['lost_tip_edits']}/{result['acknowledged_tip_edits']}  "
+            f"failed {result['failed_requests']}"
+        )
+
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump({'base_url': base_url, 'concurrency': args.concurrency, 'results': results}, output, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,7 +1,11 @@
 from django.contrib import admin
-from .models import Product, Order, Quantity
+from .models import Product, Order, Quantity, DailySalesRollup, OrderNumberSequence, OrderHistory, QuantityHistory
 
 # Register your models here.
 admin.site.register(Product)
 admin.site.register(Order)
-admin.site.register(Quantity)
\ No newline at end of file
+admin.site.register(Quantity)
+admin.site.register(DailySalesRollup)
+admin.site.register(OrderNumberSequence)
+admin.site.register(OrderHistory)
+admin.site.register(QuantityHistory)
@@ -0,0 +1,57 @@
+from collections import defaultdict
+from datetime import date
+
+from django.db import transaction
+from django.db.models import F
+
+from . import changes, rollup, transitions
+from .models import Order
+
+
+def update_orders(order_changes):
+    """Apply [{'id': ..., <field>: <value>, ...}] partial changes at once.
+
+    Changes that set the same values are grouped into one
+    ``UPDATE ... WHERE id IN (...)``, all inside one transaction, with the
+    rollup and the change feed kept in step. A state change must be one of
+    the transitions.TRANSITIONS steps; orders whose change is not are left
+    alone. Returns {id: 'updated' | 'conflict' | 'not_found'} in request
+    order.
+    """
+    ids = [change['id'] for change in order_changes]
+    with transaction.atomic():
+        old = {
+            row['id']: row
+            for row in Order.objects.select_for_update().filter(pk__in=ids).values('id', *rollup.TRACKED_FIELDS)
+        }
+        groups = defaultdict(list)
+        conflicts = set()
+        for change in order_changes:
+            if change['id'] not in old:
+                continue
+            values = {field: value for field, value in change.items() if field != 'id'}
+            state = old[change['id']]['state']
+            if not transitions.allowed(state, values.get('state', state)):
+                conflicts.add(change['id'])
+                continue
+            if values.get('state') == Order.State.PAID and state != Order.State.PAID:
+                values['date_paid'] = date.today()
+            groups[tuple(sorted(values.items()))].append(change['id'])
+
+        retip = []
+        for values, group in groups.items():
+            Order.objects.filter(pk__in=group).update(**dict(values))
+            if 'percentage_tip' in dict(values):
+                retip.extend(group)
+        if retip:
+            Order.objects.filter(pk__in=retip).update(total_tip=F('total_check') * F('percentage_tip') / 100)
+
+        updated = [order_id for order_id in old if order_id not in conflicts]
+        deltas = rollup.add_rows({}, (old[order_id] for order_id in updated), -1)
+        rollup.add_rows(deltas, Order.objects.filter(pk__in=updated).values(*rollup.TRACKED_FIELDS), 1)
+        rollup.apply_deltas(deltas)
+        changes.record_orders(updated)
+    return {
+        order_id: 'not_found' if order_id not in old else 'conflict' if order_id in conflicts else 'updated'
+        for order_id in ids
+    }
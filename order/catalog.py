@@ -0,0 +1,114 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from rest_framework import status
+from rest_framework.response import Response
+
+VERSION_KEY = 'order:catalog:version'
+
+
+class LRUCache:
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            try:
+                self._data.move_to_end(key)
+            except KeyError:
+                return None
+            return self._data[key]
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+local_cache = LRUCache(settings.PRODUCT_CATALOG_LRU_SIZE)
+
+
+def shared_cache():
+    return caches[settings.PRODUCT_CATALOG_CACHE]
+
+
+def get_version():
+    cache = shared_cache()
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        # Seed from the clock so a lost counter never comes back as a
+        # version some LRU still holds entries for.
+        cache.add(VERSION_KEY, time.time_ns(), timeout=None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+def bump_version():
+    cache = shared_cache()
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.add(VERSION_KEY, time.time_ns(), timeout=None)
+
+
+def product_changed(**kwargs):
+    # Bump now so nothing cached during the transaction outlives it, and
+    # again on commit so readers that raced the commit get evicted too.
+    bump_version()
+    transaction.on_commit(bump_version)
+
+
+def etag_matches(if_none_match, etag):
+    """Weak comparison of ``etag`` against an If-None-Match header value."""
+    for tag in if_none_match.split(','):
+        tag = tag.strip()
+        if tag == '*' or tag.removeprefix('W/') == etag:
+            return True
+    return False
+
+
+def cached_response(request, build):
+    """Serve a catalog GET from the per-version cache, or 304 on a matching ETag."""
+    key = f'order:catalog:{get_version()}:{request.accepted_media_type}:{request.get_full_path()}'
+    etag = '"' + hashlib.sha1(key.encode()).hexdigest() + '"'
+    headers = {'ETag': etag, 'Cache-Control': 'no-cache'}
+
+    if etag_matches(request.headers.get('If-None-Match', ''), etag):
+        return Response(status=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    data = local_cache.get(key)
+    if data is None:
+        data = shared_cache().get(key)
+        if data is not None:
+            local_cache.set(key, data)
+    if data is not None:
+        return Response(data, headers=headers)
+
+    response = build()
+    if response.status_code == status.HTTP_200_OK:
+        local_cache.set(key, response.data)
+        shared_cache().set(key, response.data)
+        for name, value in headers.items():
+            response[name] = value
+    return response
+
+
+class CatalogCacheMixin:
+    def list(self, request, *args, **kwargs):
+        return cached_response(request, lambda: super(CatalogCacheMixin, self).list(request, *args, **kwargs))
+
+    def retrieve(self, request, *args, **kwargs):
+        return cached_response(request, lambda: super(CatalogCacheMixin, self).retrieve(request, *args, **kwargs))
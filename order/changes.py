@@ -0,0 +1,144 @@
+import asyncio
+import threading
+import time
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max, Min
+from django.utils import timezone
+
+from . import serilizers
+from .models import Order, OrderChange, Quantity
+
+# Wakes feed readers in this process as soon as a change is committed; other
+# processes' changes are picked up by the poll interval.
+_condition = threading.Condition()
+
+
+def _notify():
+    with _condition:
+        _condition.notify_all()
+
+
+def record(kind, object_ids, deleted=False):
+    """Log changed orders or lines to the feed once the transaction commits.
+
+    Writing after commit keeps the gap between an id being allocated and it
+    becoming visible down to a single autocommit INSERT.
+    """
+    object_ids = list(object_ids)
+    if not object_ids:
+        return
+
+    def write():
+        OrderChange.objects.bulk_create(
+            OrderChange(kind=kind, object_id=object_id, deleted=deleted) for object_id in object_ids
+        )
+        _notify()
+
+    transaction.on_commit(write)
+
+
+def record_orders(order_ids, deleted=False):
+    record(OrderChange.Kind.ORDER, order_ids, deleted)
+
+
+def record_quantities(quantity_ids, deleted=False):
+    record(OrderChange.Kind.QUANTITY, quantity_ids, deleted)
+
+
+# What the feed follows unless the reader asks for other states.
+OPEN_STATES = (Order.State.ORDERING, Order.State.CHECKING)
+
+
+class CursorExpired(Exception):
+    pass
+
+
+def head():
+    return OrderChange.objects.aggregate(head=Max('id'))['head'] or 0
+
+
+def snapshot(states=None):
+    orders = Order.objects.filter(state__in=states or OPEN_STATES).order_by('id')
+    quantities = Quantity.objects.filter(order__in=orders.values('id')).order_by('id')
+    cursor = head()
+    return {
+        'cursor': cursor,
+        'orders': serilizers.OrderSerializer(orders, many=True).data,
+        'quantities': serilizers.QuantitySerializer(quantities, many=True).data,
+        'deleted': {'orders': [], 'quantities': []},
+    }
+
+
+def since(cursor, states=None, limit=None):
+    """Everything that changed after ``cursor``, or None if nothing did."""
+    oldest = OrderChange.objects.aggregate(oldest=Min('id'))['oldest']
+    if oldest is not None and cursor < oldest - 1:
+        raise CursorExpired(cursor)
+
+    limit = limit or settings.ORDER_CHANGES_PAGE_SIZE
+    settled = timezone.now() - timedelta(seconds=settings.ORDER_CHANGES_SETTLE_SECONDS)
+    changes = list(
+        OrderChange.objects.filter(id__gt=cursor, created_at__lte=settled)
+        .order_by('id')
+        .values_list('id', 'kind', 'object_id', 'deleted')[:limit]
+    )
+    if not changes:
+        return None
+
+    ids = {OrderChange.Kind.ORDER: set(), OrderChange.Kind.QUANTITY: set()}
+    for _, kind, object_id, deleted in changes:
+        ids[kind].add(object_id)
+
+    orders = Order.objects.filter(pk__in=ids[OrderChange.Kind.ORDER]).order_by('id')
+    quantities = Quantity.objects.filter(pk__in=ids[OrderChange.Kind.QUANTITY]).order_by('id')
+    states = states or OPEN_STATES
+    orders = orders.filter(state__in=states)
+    quantities = quantities.filter(order__state__in=states)
+    orders = serilizers.OrderSerializer(orders, many=True).data
+    quantities = serilizers.QuantitySerializer(quantities, many=True).data
+    present_orders = {order['id'] for order in orders}
+    present_quantities = {quantity['id'] for quantity in quantities}
+    return {
+        'cursor': changes[-1][0],
+        'orders': orders,
+        'quantities': quantities,
+        # Gone, or no longer in the requested states.
+        'deleted': {
+            'orders': sorted(ids[OrderChange.Kind.ORDER] - present_orders),
+            'quantities': sorted(ids[OrderChange.Kind.QUANTITY] - present_quantities),
+        },
+    }
+
+
+def wait_for(cursor, states=None, timeout=0):
+    """Long-poll: return changes after ``cursor`` as soon as there are any."""
+    deadline = time.monotonic() + timeout
+    while True:
+        data = since(cursor, states)
+        remaining = deadline - time.monotonic()
+        if data is not None or remaining <= 0:
+            return data
+        with _condition:
+            notified = _condition.wait(min(remaining, settings.ORDER_CHANGES_POLL_INTERVAL))
+        if notified:
+            time.sleep(settings.ORDER_CHANGES_SETTLE_SECONDS)
+
+
+async def await_for(cursor, states=None, timeout=0):
+    """wait_for() for the event loop: no thread is held between polls, so it
+    only wakes every ORDER_CHANGES_POLL_INTERVAL."""
+    deadline = time.monotonic() + timeout
+    while True:
+        data = await sync_to_async(since)(cursor, states)
+        remaining = deadline - time.monotonic()
+        if data is not None or remaining <= 0:
+            return data
+        await asyncio.sleep(min(remaining, settings.ORDER_CHANGES_POLL_INTERVAL))
+
+
+def prune(older_than):
+    return OrderChange.objects.filter(created_at__lt=older_than).delete()[0]
@@ -0,0 +1,61 @@
+from django.db import transaction
+from django.db.models import F, Sum
+from django.db.models.functions import Coalesce
+
+from . import changes, rollup
+from .models import Order
+
+OPEN_STATES = [Order.State.ORDERING, Order.State.CHECKING]
+
+
+def split_check(table_id):
+    """Per-customer subtotal, tip and total for a table's open orders.
+
+    One grouped query over orders and their lines. Line prices come from the
+    Quantity.price snapshot, so the product table is not needed.
+    """
+    rows = (
+        Order.objects.filter(table_id=table_id, state__in=OPEN_STATES)
+        .values('id', 'customer_id', 'percentage_tip')
+        .annotate(subtotal=Coalesce(Sum(F('quantity__price') * F('quantity__quantity')), 0))
+        .annotate(tip=F('subtotal') * F('percentage_tip') / 100)
+        .order_by('customer_id', 'id')
+    )
+
+    customers = {}
+    for row in rows:
+        customer = customers.setdefault(row['customer_id'], {
+            'customer_id': row['customer_id'],
+            'orders': [],
+            'subtotal': 0,
+            'tip': 0,
+            'total': 0,
+        })
+        customer['orders'].append(row['id'])
+        customer['subtotal'] += row['subtotal']
+        customer['tip'] += row['tip']
+        customer['total'] += row['subtotal'] + row['tip']
+
+    customers = list(customers.values())
+    return {
+        'table_id': table_id,
+        'customers': customers,
+        'subtotal': sum(customer['subtotal'] for customer in customers),
+        'tip': sum(customer['tip'] for customer in customers),
+        'total': sum(customer['total'] for customer in customers),
+    }
+
+
+def request_check(table_id):
+    """Move the table's ORDERING orders to CHECKING and return the split check."""
+    with transaction.atomic():
+        ordering = Order.objects.filter(table_id=table_id, state=Order.State.ORDERING)
+        # Lock the orders first: a line write has to lock its order to adjust
+        # the totals, so none can slip in between the state change and the
+        # split below.
+        order_ids = list(ordering.select_for_update().values_list('id', flat=True))
+        if order_ids:
+            Order.objects.filter(pk__in=order_ids).update(state=Order.State.CHECKING)
+            rollup.record_transition(order_ids, Order.State.ORDERING, Order.State.CHECKING)
+            changes.record_orders(order_ids)
+        return split_check(table_id)
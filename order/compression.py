@@ -0,0 +1,56 @@
+import re
+
+from django.conf import settings
+from django.middleware.gzip import GZipMiddleware
+from django.utils.cache import patch_vary_headers
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+re_accepts_brotli = re.compile(r'\bbr\b')
+
+# Responses that are compressed already.
+PRECOMPRESSED_TYPES = ('application/gzip',)
+
+# Streams whose clients need each chunk as it is written. gzip holds chunks
+# back until it has enough to compress, so these go out as they are.
+UNBUFFERED_TYPES = ('text/event-stream',)
+
+
+class CompressionMiddleware(GZipMiddleware):
+    """GZipMiddleware that prefers brotli when the client accepts it.
+
+    Brotli needs the optional ``brotli`` package and is only used for
+    non-streaming responses; streams and other clients get gzip. Server-sent
+    events are never compressed.
+    """
+
+    def process_response(self, request, response):
+        if response.get('Content-Type', '').startswith(PRECOMPRESSED_TYPES + UNBUFFERED_TYPES):
+            return response
+        accept_encoding = request.META.get('HTTP_ACCEPT_ENCODING', '')
+        if (
+            brotli is None
+            or response.streaming
+            or response.has_header('Content-Encoding')
+            or not re_accepts_brotli.search(accept_encoding)
+        ):
+            return super().process_response(request, response)
+
+        if len(response.content) < 200:
+            return response
+        patch_vary_headers(response, ('Accept-Encoding',))
+        compressed = brotli.compress(response.content, quality=settings.ORDER_BROTLI_QUALITY)
+        if len(compressed) >= len(response.content):
+            return response
+        response.content = compressed
+        response.headers['Content-Length'] = str(len(compressed))
+        # The body differs from the uncompressed one; weaken the ETag like
+        # GZipMiddleware does.
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
+        response.headers['Content-Encoding'] = 'br'
+        return response
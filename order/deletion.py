@@ -0,0 +1,187 @@
+import fcntl
+import gzip
+import json
+import os
+from collections import defaultdict
+from contextlib import contextmanager
+from pathlib import Path
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import router, transaction
+
+from . import rollup
+from .history import TABLES
+from .models import Order
+
+DEFAULT_BATCH_SIZE = 500
+
+
+class JobInProgress(Exception):
+    pass
+
+
+class OrderDeletionService:
+    """Archive PAID orders in a date range to gzipped JSONL, then delete them.
+
+    Orders already moved to the history tables (order.history) are covered
+    too; ids are shared, so one pk-ordered pass walks both tables.
+
+    Work happens in primary-key ordered batches, each deleted in its own short
+    transaction. A checkpoint file next to the archive records how far the job
+    got, so calling it again for the same range resumes where it stopped.
+    Runs for the same range are serialized with a lock file; a second one
+    raises JobInProgress. ORDER_ARCHIVE_DIR must be writable and outlive the
+    request, or the checkpoint (and the archive) are lost.
+    """
+
+    @staticmethod
+    def paths(start_date, end_date):
+        archive_dir = Path(settings.ORDER_ARCHIVE_DIR)
+        stem = f'orders-{start_date:%Y%m%d}-{end_date:%Y%m%d}'
+        return archive_dir / f'{stem}.jsonl.gz', archive_dir / f'{stem}.checkpoint.json'
+
+    @staticmethod
+    @contextmanager
+    def _lock(archive_path):
+        # flock() is released by the kernel if the process dies, so a crashed
+        # run never leaves the range locked.
+        with open(archive_path.with_name(archive_path.name + '.lock'), 'a') as lock:
+            try:
+                fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                raise JobInProgress(archive_path.name)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    @staticmethod
+    def _load_checkpoint(path, archive_path):
+        if path.exists():
+            return json.loads(path.read_text())
+        return {
+            'last_pk': 0,
+            'pending': [],
+            'orders_deleted': 0,
+            'lines_deleted': 0,
+            'archive_bytes': archive_path.stat().st_size if archive_path.exists() else 0,
+        }
+
+    @staticmethod
+    def _save_checkpoint(path, checkpoint):
+        tmp = path.with_suffix('.tmp')
+        tmp.write_text(json.dumps(checkpoint))
+        os.replace(tmp, path)
+
+    @staticmethod
+    def _archive(archive_path, ids):
+        lines = defaultdict(list)
+        orders = []
+        for order_model, line_model in TABLES:
+            paid = list(order_model.objects.filter(pk__in=ids, state=Order.State.PAID).values())
+            paid_ids = [order['id'] for order in paid]
+            for line in line_model.objects.filter(order_id__in=paid_ids).order_by('pk').values():
+                lines[line['order_id']].append(line)
+            orders.extend(paid)
+        records = []
+        for order in sorted(orders, key=lambda order: order['id']):
+            order['lines'] = lines.get(order['id'], [])
+            records.append(json.dumps(order, cls=DjangoJSONEncoder))
+        # Every batch is its own gzip member; concatenated members are still
+        # one valid gzip stream.
+        with open(archive_path, 'ab') as raw:
+            raw.write(gzip.compress(('\n'.join(records) + '\n').encode()))
+            raw.flush()
+            os.fsync(raw.fileno())
+            return raw.tell()
+
+    @staticmethod
+    def _delete(ids):
+        using = router.db_for_write(Order)
+        orders_deleted = lines_deleted = 0
+        with transaction.atomic(using=using):
+            rows = []
+            for order_model, line_model in TABLES:
+                # Only orders still PAID under the lock go, and only their
+                # lines: anything reopened since the archive pass stays.
+                locked = list(
+                    order_model.objects.filter(pk__in=ids, state=Order.State.PAID)
+                    .select_for_update().values('id', *rollup.TRACKED_FIELDS)
+                )
+                paid_ids = [row['id'] for row in locked]
+                rows.extend(locked)
+                # _raw_delete skips the Collector: we already know the only
+                # dependent rows are the order lines, and they are archived.
+                lines_deleted += line_model.objects.filter(order_id__in=paid_ids)._raw_delete(using)
+                orders_deleted += order_model.objects.filter(pk__in=paid_ids)._raw_delete(using)
+            rollup.apply_deltas(rollup.add_rows({}, rows, -1))
+        return orders_deleted, lines_deleted
+
+    @staticmethod
+    def _candidates(start_date, end_date, after_pk):
+        return [
+            order_model.objects.filter(
+                date_created__range=[start_date, end_date], state=Order.State.PAID, pk__gt=after_pk,
+            ).order_by()
+            for order_model, _ in TABLES
+        ]
+
+    @classmethod
+    def delete_orders(cls, start_date, end_date, batch_size=DEFAULT_BATCH_SIZE, max_batches=None):
+        # Every batch's ids are loaded at once; keep them bounded.
+        batch_size = min(batch_size, settings.ORDER_DELETE_MAX_BATCH_SIZE)
+        archive_path, checkpoint_path = cls.paths(start_date, end_date)
+        archive_path.parent.mkdir(parents=True, exist_ok=True)
+        with cls._lock(archive_path):
+            return cls._run(start_date, end_date, batch_size, max_batches, archive_path, checkpoint_path)
+
+    @classmethod
+    def _run(cls, start_date, end_date, batch_size, max_batches, archive_path, checkpoint_path):
+        checkpoint = cls._load_checkpoint(checkpoint_path, archive_path)
+
+        # Drop anything appended after the last checkpoint: that batch was
+        # never marked pending, so none of its rows were deleted.
+        if archive_path.exists() and archive_path.stat().st_size > checkpoint['archive_bytes']:
+            os.truncate(archive_path, checkpoint['archive_bytes'])
+
+        batches = 0
+        done = False
+        while True:
+            if checkpoint['pending']:
+                orders_deleted, lines_deleted = cls._delete(checkpoint['pending'])
+                checkpoint['orders_deleted'] += orders_deleted
+                checkpoint['lines_deleted'] += lines_deleted
+                checkpoint['pending'] = []
+                cls._save_checkpoint(checkpoint_path, checkpoint)
+                batches += 1
+
+            if max_batches is not None and batches >= max_batches:
+                break
+            live, archived = (
+                part.values_list('pk', flat=True)
+                for part in cls._candidates(start_date, end_date, checkpoint['last_pk'])
+            )
+            ids = list(live.union(archived, all=True).order_by('pk')[:batch_size])
+            if not ids:
+                done = True
+                break
+            checkpoint['archive_bytes'] = cls._archive(archive_path, ids)
+            checkpoint['last_pk'] = ids[-1]
+            checkpoint['pending'] = ids
+            cls._save_checkpoint(checkpoint_path, checkpoint)
+
+        remaining = 0 if done else sum(
+            part.count() for part in cls._candidates(start_date, end_date, checkpoint['last_pk'])
+        )
+        if not remaining:
+            done = True
+            checkpoint_path.unlink(missing_ok=True)
+        return {
+            'orders_deleted': checkpoint['orders_deleted'],
+            'lines_deleted': checkpoint['lines_deleted'],
+            'last_pk': checkpoint['last_pk'],
+            'remaining': remaining,
+            'done': done,
+            'archive': archive_path.name,
+        }
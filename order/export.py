@@ -0,0 +1,95 @@
+import csv
+import json
+import zlib
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .history import TABLES
+from .streaming import iter_chunks
+
+FORMATS = {
+    'csv': ('text/csv', 'csv'),
+    'jsonl': ('application/x-ndjson', 'jsonl'),
+}
+
+ORDER_COLUMNS = [
+    'id', 'number', 'table_id', 'customer_id', 'waiter_id', 'state',
+    'total_check', 'percentage_tip', 'total_tip', 'date_created', 'date_paid',
+]
+
+LINE_COLUMNS = ['id', 'product_id', 'product__name', 'product__category', 'quantity', 'price']
+
+CSV_HEADER = (
+    ['order_' + column if column == 'id' else column for column in ORDER_COLUMNS]
+    + ['line_id', 'product_id', 'product_name', 'category', 'quantity', 'price']
+)
+
+DEFAULT_CHUNK_SIZE = 2000
+
+
+def iter_orders(start_date, end_date, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Yield (order_row, line_rows) pairs, a chunk of orders at a time.
+
+    Orders, live and archived (order.history), come through a server-side
+    cursor (QuerySet.iterator); each chunk pulls its lines, joined to their
+    products, with one extra query.
+    """
+    live, archived = (
+        order_model.objects.filter(date_created__range=[start_date, end_date]).order_by().values_list(*ORDER_COLUMNS)
+        for order_model, _ in TABLES
+    )
+    orders = live.union(archived, all=True).order_by('id')
+    for chunk in iter_chunks(orders.iterator(chunk_size=chunk_size), chunk_size):
+        ids = [order[0] for order in chunk]
+        live_lines, archived_lines = (
+            line_model.objects.filter(order_id__in=ids).order_by().values_list('order_id', *LINE_COLUMNS)
+            for _, line_model in TABLES
+        )
+        lines = {}
+        for row in live_lines.union(archived_lines, all=True).order_by('order_id', 'id'):
+            lines.setdefault(row[0], []).append(row[1:])
+        for order in chunk:
+            yield order, lines.get(order[0], [])
+
+
+class _Echo:
+    def write(self, value):
+        return value
+
+
+def csv_rows(records):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(CSV_HEADER)
+    for order, lines in records:
+        # One row per line; orders without lines still get a row.
+        for line in lines or [(None,) * len(LINE_COLUMNS)]:
+            yield writer.writerow(order + line)
+
+
+def jsonl_rows(records):
+    line_keys = ['id', 'product_id', 'product_name', 'category', 'quantity', 'price']
+    for order, lines in records:
+        data = dict(zip(ORDER_COLUMNS, order))
+        data['lines'] = [dict(zip(line_keys, line)) for line in lines]
+        yield json.dumps(data, cls=DjangoJSONEncoder, separators=(',', ':')) + '\n'
+
+
+def gzipped(pieces, batch_bytes=64 * 1024):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    buffered = []
+    size = 0
+    for piece in pieces:
+        buffered.append(piece.encode())
+        size += len(buffered[-1])
+        if size >= batch_bytes:
+            data = compressor.compress(b''.join(buffered))
+            buffered, size = [], 0
+            if data:
+                yield data
+    yield compressor.compress(b''.join(buffered)) + compressor.flush()
+
+
+def export(start_date, end_date, output='csv', gzip=False, chunk_size=DEFAULT_CHUNK_SIZE):
+    records = iter_orders(start_date, end_date, chunk_size)
+    pieces = csv_rows(records) if output == 'csv' else jsonl_rows(records)
+    return gzipped(pieces) if gzip else pieces
@@ -0,0 +1,126 @@
+from django.conf import settings
+from rest_framework import ISO_8601, serializers
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+
+# Serializer fields whose to_representation() is the identity for the values
+# Django hands back from values_list(): ints, strings, choice values and
+# foreign-key ids.
+_IDENTITY_FIELDS = (
+    serializers.IntegerField,
+    serializers.CharField,
+    serializers.ChoiceField,
+    serializers.PrimaryKeyRelatedField,
+)
+
+_compiled = {}
+
+
+def _date_to_iso(value):
+    return value.isoformat()
+
+
+def _converter(field):
+    if isinstance(field, serializers.DateTimeField):
+        return False
+    if isinstance(field, serializers.DateField):
+        if getattr(field, 'format', api_settings.DATE_FORMAT) not in (ISO_8601, None):
+            return False
+        return _date_to_iso
+    if isinstance(field, _IDENTITY_FIELDS) and not isinstance(field, serializers.ManyRelatedField):
+        return None
+    return False
+
+
+def compile_serializer(serializer_class):
+    """Map a ModelSerializer onto values_list() columns and per-column converters.
+
+    Returns None when the serializer has a field the fast path cannot
+    reproduce exactly; callers then fall back to the serializer.
+    """
+    if serializer_class in _compiled:
+        return _compiled[serializer_class]
+
+    serializer = serializer_class()
+    opts = serializer.Meta.model._meta
+    names, columns, converters = [], [], []
+    plan = None
+    for name, field in serializer.fields.items():
+        if field.write_only:
+            continue
+        converter = _converter(field)
+        if converter is False or '.' in field.source:
+            break
+        names.append(name)
+        columns.append(opts.get_field(field.source).attname)
+        converters.append(converter)
+    else:
+        plan = (tuple(names), tuple(columns), tuple((i, c) for i, c in enumerate(converters) if c))
+
+    _compiled[serializer_class] = plan
+    return plan
+
+
+def narrow_plan(plan, fields):
+    """Keep only the columns of ``plan`` whose names are in ``fields``."""
+    names, columns, converters = plan
+    keep = [index for index, name in enumerate(names) if name in fields]
+    by_index = dict(converters)
+    return (
+        tuple(names[index] for index in keep),
+        tuple(columns[index] for index in keep),
+        tuple((position, by_index[index]) for position, index in enumerate(keep) if index in by_index),
+    )
+
+
+def row_converter(plan):
+    names, _, converters = plan
+
+    def convert(row):
+        if converters:
+            row = list(row)
+            for index, converter in converters:
+                if row[index] is not None:
+                    row[index] = converter(row[index])
+        return dict(zip(names, row))
+
+    return convert
+
+
+def serialize_rows(plan, queryset):
+    convert = row_converter(plan)
+    return [convert(row) for row in queryset.values_list(*plan[1])]
+
+
+async def aserialize_rows(plan, queryset):
+    convert = row_converter(plan)
+    return [convert(row) async for row in queryset.values_list(*plan[1])]
+
+
+class ValuesListMixin:
+    """Opt-in list() that skips model instances and field-by-field serialization.
+
+    Enabled with the ORDER_API_VALUES_LISTS setting. The output is the same
+    JSON the serializer would have produced.
+    """
+
+    def get_values_plan(self):
+        return compile_serializer(self.get_serializer_class())
+
+    def list(self, request, *args, **kwargs):
+        plan = self.get_values_plan() if settings.ORDER_API_VALUES_LISTS else None
+        if plan is None:
+            return super().list(request, *args, **kwargs)
+
+        queryset = self.filter_queryset(self.get_queryset())
+        paginate_values = getattr(self.paginator, 'paginate_values', None)
+        if paginate_values is not None:
+            rows = paginate_values(queryset, request, plan[1])
+            if rows is not None:
+                convert = row_converter(plan)
+                return self.get_paginated_response([convert(row) for row in rows])
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            serializer = self.get_serializer(page, many=True)
+            return self.get_paginated_response(serializer.data)
+        return Response(serialize_rows(plan, queryset))
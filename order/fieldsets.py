@@ -0,0 +1,57 @@
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import SAFE_METHODS
+
+from .fastpath import narrow_plan
+
+
+class SparseFieldsetMixin:
+    """``?fields=id,name`` on reads: only those fields are serialized, and
+    only their columns are selected.
+    """
+
+    def get_sparse_fields(self):
+        if not hasattr(self, '_sparse_fields'):
+            self._sparse_fields = None
+            value = self.request.query_params.get('fields') if self.request.method in SAFE_METHODS else None
+            if value:
+                wanted = {name.strip() for name in value.split(',') if name.strip()}
+                available = self.get_serializer_class()().fields
+                unknown = sorted(wanted - set(available))
+                if unknown:
+                    raise ValidationError({'fields': f'Unknown fields: {", ".join(unknown)}.'})
+                # Serializer order, not request order, so responses stay stable.
+                self._sparse_fields = tuple(name for name in available if name in wanted)
+        return self._sparse_fields
+
+    def get_serializer(self, *args, **kwargs):
+        serializer = super().get_serializer(*args, **kwargs)
+        fields = self.get_sparse_fields()
+        if fields:
+            target = getattr(serializer, 'child', serializer)
+            for name in list(target.fields):
+                if name not in fields:
+                    target.fields.pop(name)
+        return serializer
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        fields = self.get_sparse_fields()
+        if not fields:
+            return queryset
+        opts = queryset.model._meta
+        serializer_fields = self.get_serializer_class()().fields
+        sources = [serializer_fields[name].source for name in fields]
+        try:
+            columns = [opts.get_field(source).name for source in sources]
+        except FieldDoesNotExist:
+            # A computed or nested field; load whole rows.
+            return queryset
+        # Keyset pagination reads its keys off the last row of the page.
+        keys = getattr(self.paginator, 'keys', ())
+        return queryset.only(opts.pk.name, *columns, *keys)
+
+    def get_values_plan(self):
+        plan = super().get_values_plan()
+        fields = self.get_sparse_fields()
+        return narrow_plan(plan, fields) if plan and fields else plan
@@ -0,0 +1,42 @@
+from datetime import datetime
+
+from django.core.exceptions import ValidationError as DjangoValidationError
+from rest_framework.exceptions import ValidationError
+from rest_framework.filters import BaseFilterBackend
+
+
+class FieldFilterBackend(BaseFilterBackend):
+    """Query-string filters declared on the view.
+
+    ``filter_fields`` maps a parameter to a model field for exact matches;
+    a comma-separated value matches any of its values. ``date_filter_field``
+    enables ``start_date`` / ``end_date`` (inclusive, YYYY-MM-DD).
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        opts = queryset.model._meta
+        for param, name in getattr(view, 'filter_fields', {}).items():
+            value = request.query_params.get(param)
+            if not value:
+                continue
+            field = opts.get_field(name)
+            try:
+                values = [field.to_python(item) for item in value.split(',')]
+            except DjangoValidationError:
+                raise ValidationError({param: f'Invalid value: {value}.'})
+            if field.choices and any(item not in dict(field.choices) for item in values):
+                raise ValidationError({param: f'Invalid value: {value}.'})
+            queryset = queryset.filter(**{f'{name}__in': values}) if len(values) > 1 else queryset.filter(**{name: values[0]})
+
+        date_field = getattr(view, 'date_filter_field', None)
+        if date_field:
+            for param, lookup in (('start_date', 'gte'), ('end_date', 'lte')):
+                value = request.query_params.get(param)
+                if not value:
+                    continue
+                try:
+                    day = datetime.strptime(value, '%Y-%m-%d').date()
+                except ValueError:
+                    raise ValidationError({param: 'Invalid date format. Please provide dates in the format: YYYY-MM-DD.'})
+                queryset = queryset.filter(**{f'{date_field}__{lookup}': day})
+        return queryset
@@ -0,0 +1,114 @@
+import heapq
+from datetime import date, timedelta
+from operator import itemgetter
+
+from django.db import router, transaction
+
+from .models import Order, OrderHistory, Quantity, QuantityHistory
+from .pagination import cursor_condition, encode_cursor
+
+DEFAULT_BATCH_SIZE = 500
+
+ORDER_COLUMNS = [field.attname for field in OrderHistory._meta.concrete_fields]
+LINE_COLUMNS = [field.attname for field in QuantityHistory._meta.concrete_fields]
+
+# (orders, lines) model pairs to read when a query must see every order.
+TABLES = [(Order, Quantity), (OrderHistory, QuantityHistory)]
+
+
+def archive_paid_orders(older_than_days, batch_size=DEFAULT_BATCH_SIZE, max_batches=None):
+    """Move PAID orders created more than ``older_than_days`` ago, and their
+    lines, into OrderHistory / QuantityHistory.
+
+    Each batch is copied and deleted in one short transaction, so a stopped
+    job leaves nothing half-moved and can simply be run again. The sales
+    rollup counts live and archived orders alike and is not touched.
+    """
+    cutoff = date.today() - timedelta(days=older_than_days)
+    candidates = Order.objects.filter(state=Order.State.PAID, date_created__lt=cutoff)
+    using = router.db_for_write(Order)
+    orders_moved = lines_moved = batches = 0
+    done = False
+    while max_batches is None or batches < max_batches:
+        ids = list(candidates.order_by('pk').values_list('pk', flat=True)[:batch_size])
+        if not ids:
+            done = True
+            break
+        with transaction.atomic(using=using):
+            # Re-check the state under lock: an order may have been reopened.
+            orders = Order.objects.filter(pk__in=ids, state=Order.State.PAID)
+            rows = list(orders.select_for_update().values(*ORDER_COLUMNS))
+            moved = [row['id'] for row in rows]
+            lines = list(Quantity.objects.filter(order_id__in=moved).select_for_update().values(*LINE_COLUMNS))
+            OrderHistory.objects.bulk_create(OrderHistory(**row) for row in rows)
+            QuantityHistory.objects.bulk_create(QuantityHistory(**row) for row in lines)
+            # Delete exactly the lines copied above. A line added since then
+            # still references its order, so the batch fails and rolls back
+            # instead of losing it.
+            lines_moved += Quantity.objects.filter(pk__in=[row['id'] for row in lines])._raw_delete(using)
+            orders_moved += Order.objects.filter(pk__in=moved)._raw_delete(using)
+        batches += 1
+
+    remaining = 0 if done else candidates.count()
+    return {
+        'orders_moved': orders_moved,
+        'lines_moved': lines_moved,
+        'remaining': remaining,
+        'done': not remaining,
+    }
+
+
+def _parts(start_date, end_date, cursor=None):
+    parts = []
+    for model, _ in TABLES:
+        queryset = model.objects.filter(date_created__range=[start_date, end_date]).order_by()
+        if cursor:
+            queryset = queryset.filter(cursor_condition(cursor))
+        parts.append(queryset)
+    return parts
+
+
+def orders_between(start_date, end_date):
+    """Live and archived orders in the range as dicts, in (date_created, id) order."""
+    live, archived = (part.values(*ORDER_COLUMNS) for part in _parts(start_date, end_date))
+    return live.union(archived, all=True).order_by('date_created', 'id')
+
+
+def order_rows_between(start_date, end_date, columns):
+    """Like orders_between, but values_list() tuples of ``columns``."""
+    live, archived = (part.values_list(*columns) for part in _parts(start_date, end_date))
+    return live.union(archived, all=True).order_by('date_created', 'id')
+
+
+def _page_parts(start_date, end_date, limit, cursor):
+    # Each table is ordered and limited on its own index, so a page costs
+    # the same however deep the cursor is; the two short lists are merged
+    # here rather than under one ORDER BY/LIMIT around the UNION, which
+    # would read every row after the cursor.
+    return [part.order_by('date_created', 'id')[:limit] for part in _parts(start_date, end_date, cursor)]
+
+
+def _merge(parts, limit, key):
+    return list(heapq.merge(*parts, key=key))[:limit]
+
+
+def page_between(start_date, end_date, page_size, cursor=None):
+    parts = [list(part.values(*ORDER_COLUMNS)) for part in _page_parts(start_date, end_date, page_size + 1, cursor)]
+    rows = _merge(parts, page_size + 1, itemgetter('date_created', 'id'))
+    next_cursor = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        next_cursor = encode_cursor(rows[-1]['date_created'], rows[-1]['id'])
+    return rows, next_cursor
+
+
+async def arows_page_between(start_date, end_date, columns, limit, cursor=None):
+    """Up to ``limit`` values_list() tuples of ``columns`` after ``cursor``.
+
+    ``columns`` must include date_created and id.
+    """
+    parts = [
+        [row async for row in part.values_list(*columns)]
+        for part in _page_parts(start_date, end_date, limit, cursor)
+    ]
+    return _merge(parts, limit, itemgetter(columns.index('date_created'), columns.index('id')))
@@ -0,0 +1,98 @@
+import functools
+import hashlib
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.response import Response
+
+HEADER = 'Idempotency-Key'
+REPLAYED_HEADER = 'Idempotent-Replayed'
+MAX_KEY_LENGTH = 255
+
+# Responses that are not stored: the retry should run the write again.
+RETRYABLE_STATUSES = {408, 409, 425, 429}
+
+PENDING = 'pending'
+DONE = 'done'
+
+
+def store():
+    return caches[settings.ORDER_IDEMPOTENCY_CACHE]
+
+
+def cache_key(request, key):
+    # Keys are scoped to the endpoint (and user, when there is one), so the
+    # same client-generated key on two endpoints never collides.
+    user = getattr(request, 'user', None)
+    owner = user.pk if user is not None and user.is_authenticated else ''
+    scope = hashlib.sha256(f'{request.path}\n{owner}\n{key}'.encode()).hexdigest()
+    return f'order:idempotency:{scope}'
+
+
+def fingerprint(request):
+    return hashlib.sha256(request.method.encode() + b'\n' + request.body).hexdigest()
+
+
+def replay(entry):
+    response = Response(entry['data'], status=entry['status'], headers=entry['headers'])
+    response[REPLAYED_HEADER] = 'true'
+    return response
+
+
+def run(request, key, write):
+    """Run ``write`` at most once per idempotency key.
+
+    The first request claims the key with an atomic cache.add; retries get
+    409 while it is in flight and the stored response once it has finished.
+    Reusing a key with a different body is a 422.
+    """
+    if not key or len(key) > MAX_KEY_LENGTH:
+        return Response({'error': f'{HEADER} must be 1-{MAX_KEY_LENGTH} characters.'}, status=400)
+
+    cache = store()
+    name = cache_key(request, key)
+    digest = fingerprint(request)
+    pending = {'state': PENDING, 'fingerprint': digest}
+    if not cache.add(name, pending, timeout=settings.ORDER_IDEMPOTENCY_LOCK_TTL):
+        entry = cache.get(name)
+        if entry is not None:
+            if entry['fingerprint'] != digest:
+                return Response({'error': f'{HEADER} was already used with a different request.'}, status=422)
+            if entry['state'] == DONE:
+                return replay(entry)
+            response = Response({'error': 'A request with this key is still in progress.'}, status=409)
+            response['Retry-After'] = '1'
+            return response
+        # Expired between add and get; claim it again.
+        if not cache.add(name, pending, timeout=settings.ORDER_IDEMPOTENCY_LOCK_TTL):
+            return Response({'error': 'A request with this key is still in progress.'}, status=409)
+
+    try:
+        response = write()
+    except Exception:
+        cache.delete(name)
+        raise
+
+    if response.status_code >= 500 or response.status_code in RETRYABLE_STATUSES:
+        cache.delete(name)
+        return response
+    headers = {header: response[header] for header in ('Location',) if response.has_header(header)}
+    cache.set(name, {
+        'state': DONE,
+        'fingerprint': digest,
+        'status': response.status_code,
+        'data': response.data,
+        'headers': headers,
+    }, timeout=settings.ORDER_IDEMPOTENCY_TTL)
+    return response
+
+
+def idempotent(method):
+    """Honour the Idempotency-Key header on a DRF view method."""
+    @functools.wraps(method)
+    def wrapper(self, request, *args, **kwargs):
+        key = request.headers.get(HEADER)
+        if key is None:
+            return method(self, request, *args, **kwargs)
+        return run(request, key, lambda: method(self, request, *args, **kwargs))
+    return wrapper
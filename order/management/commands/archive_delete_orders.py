@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from order.deletion import DEFAULT_BATCH_SIZE, OrderDeletionService
+
+from .backfill_sales_rollup import _date
+
+
+class Command(BaseCommand):
+    help = 'Archive PAID orders in a date range to gzipped JSONL and delete them in batches. Resumable.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start-date', type=_date, required=True)
+        parser.add_argument('--end-date', type=_date, required=True)
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        while True:
+            progress = OrderDeletionService.delete_orders(
+                options['start_date'], options['end_date'], options['batch_size'], max_batches=1
+            )
+            self.stdout.write(
+                f"{progress['orders_deleted']} orders deleted, {progress['remaining']} remaining"
+            )
+            if progress['done']:
+                break
+        self.stdout.write(f"Archived to {progress['archive']}.")
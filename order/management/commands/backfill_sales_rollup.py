@@ -0,0 +1,24 @@
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from order import rollup
+
+
+def _date(value):
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except ValueError:
+        raise CommandError(f'Invalid date "{value}". Use YYYY-MM-DD.')
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the daily sales rollup from the orders table.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start-date', type=_date)
+        parser.add_argument('--end-date', type=_date)
+
+    def handle(self, *args, **options):
+        rows = rollup.rebuild(options['start_date'], options['end_date'])
+        self.stdout.write(f'Wrote {rows} rollup rows.')
@@ -0,0 +1,34 @@
+import sys
+
+from django.core.management.base import BaseCommand
+
+from order import export
+
+from .backfill_sales_rollup import _date
+
+
+class Command(BaseCommand):
+    help = 'Stream orders and their lines in a date range as CSV or JSONL, optionally gzipped.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start-date', type=_date, required=True)
+        parser.add_argument('--end-date', type=_date, required=True)
+        parser.add_argument('--output-format', choices=sorted(export.FORMATS), default='csv')
+        parser.add_argument('--gzip', action='store_true')
+        parser.add_argument('--chunk-size', type=int, default=export.DEFAULT_CHUNK_SIZE)
+        parser.add_argument('--output', help='file to write (default: stdout)')
+
+    def handle(self, *args, **options):
+        pieces = export.export(
+            options['start_date'], options['end_date'], options['output_format'], options['gzip'], options['chunk_size']
+        )
+        if options['output']:
+            with open(options['output'], 'wb') as handle:
+                for piece in pieces:
+                    handle.write(piece if options['gzip'] else piece.encode())
+        elif options['gzip']:
+            for piece in pieces:
+                sys.stdout.buffer.write(piece)
+        else:
+            for piece in pieces:
+                self.stdout.write(piece, ending='')
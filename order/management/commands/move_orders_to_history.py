@@ -0,0 +1,16 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from order.history import DEFAULT_BATCH_SIZE, archive_paid_orders
+
+
+class Command(BaseCommand):
+    help = 'Move PAID orders older than N days, with their lines, into the history tables in batches.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--older-than-days', type=int, default=settings.ORDER_HISTORY_AFTER_DAYS)
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        progress = archive_paid_orders(options['older_than_days'], options['batch_size'])
+        self.stdout.write(f"Moved {progress['orders_moved']} orders and {progress['lines_moved']} lines to history.")
@@ -0,0 +1,17 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from order import changes
+
+
+class Command(BaseCommand):
+    help = 'Delete change feed entries older than the given number of hours.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--keep-hours', type=float, default=24)
+
+    def handle(self, *args, **options):
+        deleted = changes.prune(timezone.now() - timedelta(hours=options['keep_hours']))
+        self.stdout.write(f'Deleted {deleted} change feed entries.')
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from order import totals
+
+
+class Command(BaseCommand):
+    help = 'Recompute Order.total_check and total_tip from the order lines, then rebuild the sales rollup.'
+
+    def handle(self, *args, **options):
+        updated = totals.recompute_all()
+        self.stdout.write(f'Recomputed totals for {updated} orders.')
@@ -0,0 +1,232 @@
+import contextvars
+import logging
+import threading
+import time
+from collections import deque
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+
+def percentile(ordered, fraction):
+    if not ordered:
+        return None
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+class RouteHistogram:
+    """Recent per-route samples, summarised as percentiles on read.
+
+    Samples live in this process only; every worker keeps its own window.
+    """
+
+    METRICS = ('total_ms', 'db_ms', 'render_ms', 'queries')
+
+    def __init__(self, sample_size):
+        self.sample_size = sample_size
+        self._routes = {}
+        self._counts = {}
+        self._lock = threading.Lock()
+
+    def record(self, route, **sample):
+        with self._lock:
+            samples = self._routes.get(route)
+            if samples is None:
+                samples = self._routes[route] = deque(maxlen=self.sample_size)
+            samples.append(tuple(sample[name] for name in self.METRICS))
+            self._counts[route] = self._counts.get(route, 0) + 1
+
+    def summary(self):
+        with self._lock:
+            routes = {route: list(samples) for route, samples in self._routes.items()}
+            counts = dict(self._counts)
+        data = {}
+        for route, samples in routes.items():
+            data[route] = {'count': counts[route]}
+            for index, name in enumerate(self.METRICS):
+                ordered = sorted(sample[index] for sample in samples)
+                data[route][name] = {
+                    'p50': percentile(ordered, 0.50),
+                    'p95': percentile(ordered, 0.95),
+                    'p99': percentile(ordered, 0.99),
+                }
+        return data
+
+    def clear(self):
+        with self._lock:
+            self._routes.clear()
+            self._counts.clear()
+
+
+histogram = RouteHistogram(settings.SERVER_TIMING_SAMPLE_SIZE)
+
+
+class RequestTimings:
+    def __init__(self):
+        self.queries = 0
+        self.db = 0.0
+        self.render = 0.0
+        self._render_started = None
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db += time.perf_counter() - start
+            self.queries += 1
+
+    def start_render(self):
+        self._render_started = time.perf_counter()
+
+    def stop_render(self, response):
+        if self._render_started is not None:
+            self.render += time.perf_counter() - self._render_started
+            self._render_started = None
+
+
+# The RequestTimings of the request being served. Context variables follow
+# the request into sync_to_async threads and through a streamed body, which
+# per-connection execute_wrapper() contexts on the request thread do not.
+current_timings = contextvars.ContextVar('order_server_timings', default=None)
+
+
+def count_query(execute, sql, params, many, context):
+    timings = current_timings.get()
+    if timings is None:
+        return execute(sql, params, many, context)
+    return timings(execute, sql, params, many, context)
+
+
+def install_query_counter(connection, **kwargs):
+    """connection_created receiver: count this connection's queries."""
+    if count_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(count_query)
+
+
+class ServerTimingMiddleware:
+    """Count queries and time DB, rendering and the whole view for every request.
+
+    ``render`` is the time spent in response.render(), i.e. encoding the
+    response body; serializer work the view does (``serializer.data``) is
+    part of ``view``, not ``render``.
+
+    The numbers go out as a Server-Timing header and into the per-route
+    histogram served by the metrics endpoint. Routes that run more queries
+    than their ORDER_QUERY_BUDGETS entry (or ORDER_QUERY_BUDGET_DEFAULT) log a
+    warning.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+        # Connections opened before the app registered its receiver.
+        for connection in connections.all(initialized_only=True):
+            install_query_counter(connection)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        timings, start = self.start(request)
+        token = current_timings.set(timings)
+        try:
+            response = self.get_response(request)
+        finally:
+            current_timings.reset(token)
+        return self.finish(request, response, timings, start)
+
+    async def __acall__(self, request):
+        timings, start = self.start(request)
+        token = current_timings.set(timings)
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_timings.reset(token)
+        return self.finish(request, response, timings, start)
+
+    @staticmethod
+    def start(request):
+        timings = request.server_timings = RequestTimings()
+        return timings, time.perf_counter()
+
+    def finish(self, request, response, timings, start):
+        response['Server-Timing'] = ', '.join([
+            f'db;dur={timings.db * 1000:.2f};desc="{timings.queries} queries"',
+            f'render;dur={timings.render * 1000:.2f}',
+            f'view;dur={(time.perf_counter() - start) * 1000:.2f}',
+        ])
+        if response.streaming:
+            # The header went out with what was known before the body; the
+            # histogram gets the whole request once the stream is consumed.
+            content = response.streaming_content
+            wrap = self.timed_async_stream if response.is_async else self.timed_stream
+            response.streaming_content = wrap(content, request, timings, start)
+        else:
+            self.record(request, timings, start)
+        return response
+
+    def timed_stream(self, content, request, timings, start):
+        iterator = iter(content)
+        try:
+            while True:
+                token = current_timings.set(timings)
+                try:
+                    chunk = next(iterator)
+                except StopIteration:
+                    return
+                finally:
+                    current_timings.reset(token)
+                yield chunk
+        finally:
+            self.record(request, timings, start)
+
+    async def timed_async_stream(self, content, request, timings, start):
+        iterator = content.__aiter__()
+        try:
+            while True:
+                token = current_timings.set(timings)
+                try:
+                    chunk = await iterator.__anext__()
+                except StopAsyncIteration:
+                    return
+                finally:
+                    current_timings.reset(token)
+                yield chunk
+        finally:
+            self.record(request, timings, start)
+
+    @staticmethod
+    def record(request, timings, start):
+        total = time.perf_counter() - start
+        match = getattr(request, 'resolver_match', None)
+        if match is None:
+            return
+        route = match.view_name
+        histogram.record(
+            route,
+            total_ms=total * 1000,
+            db_ms=timings.db * 1000,
+            render_ms=timings.render * 1000,
+            queries=timings.queries,
+        )
+        budget = settings.ORDER_QUERY_BUDGETS.get(route, settings.ORDER_QUERY_BUDGET_DEFAULT)
+        if budget is not None and timings.queries > budget:
+            logger.warning(
+                '%s %s ran %d queries, over its budget of %d.',
+                request.method, request.path, timings.queries, budget,
+            )
+
+    def process_template_response(self, request, response):
+        # DRF responses render right after this hook returns; time that.
+        timings = getattr(request, 'server_timings', None)
+        if timings is not None:
+            timings.start_render()
+            response.add_post_render_callback(timings.stop_render)
+        return response
@@ -0,0 +1,50 @@
+# Generated by Django 4.2.1 on 2026-10-18 14:42
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def backfill_rollup(apps, schema_editor):
+    # Existing orders; from here on signals keep the rollup in step.
+    Order = apps.get_model('order', 'Order')
+    DailySalesRollup = apps.get_model('order', 'DailySalesRollup')
+    using = schema_editor.connection.alias
+    grouped = Order.objects.using(using).order_by().values('date_created', 'state', 'waiter_id').annotate(
+        revenue=Sum('total_check'),
+        tips=Sum('total_tip'),
+        order_count=Count('id'),
+    )
+    DailySalesRollup.objects.using(using).bulk_create(
+        DailySalesRollup(
+            day=row['date_created'], state=row['state'], waiter_id=row['waiter_id'],
+            revenue=row['revenue'] or 0, tips=row['tips'] or 0, order_count=row['order_count'],
+        )
+        for row in grouped
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('order', '0009_alter_order_options_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailySalesRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('state', models.CharField(choices=[('1', 'ORDERING'), ('2', 'CHECKING'), ('3', 'PAID')], max_length=2)),
+                ('waiter_id', models.IntegerField()),
+                ('revenue', models.IntegerField(default=0)),
+                ('tips', models.IntegerField(default=0)),
+                ('order_count', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='dailysalesrollup',
+            constraint=models.UniqueConstraint(fields=('day', 'state', 'waiter_id'), name='unique_daily_sales_rollup'),
+        ),
+        migrations.RunPython(backfill_rollup, migrations.RunPython.noop),
+    ]
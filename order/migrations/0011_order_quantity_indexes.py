@@ -0,0 +1,33 @@
+# Generated by Django 4.2.1 on 2026-10-18 14:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('order', '0010_daily_sales_rollup'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['date_created', 'state'], name='order_date_state_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(condition=models.Q(('state', '3')), fields=['date_created'], name='order_paid_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['table_id', 'state'], name='order_table_state_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['waiter_id', 'date_created'], name='order_waiter_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='quantity',
+            index=models.Index(fields=['order', 'product'], name='quantity_order_product_idx'),
+        ),
+    ]
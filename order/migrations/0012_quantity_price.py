@@ -0,0 +1,58 @@
+# Generated by Django 4.2.1 on 2026-10-18 14:46
+
+from django.db import migrations, models
+from django.db.models import Count, F, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+
+def snapshot_prices(apps, schema_editor):
+    Product = apps.get_model('order', 'Product')
+    Quantity = apps.get_model('order', 'Quantity')
+    Quantity.objects.update(
+        price=Subquery(Product.objects.filter(pk=OuterRef('product_id')).values('price')[:1])
+    )
+
+
+
+def recompute_totals(apps, schema_editor):
+    # Totals are kept from the lines from here on; bring the stored ones in
+    # line with the snapshotted prices, then rebuild the rollup to match.
+    Order = apps.get_model('order', 'Order')
+    Quantity = apps.get_model('order', 'Quantity')
+    DailySalesRollup = apps.get_model('order', 'DailySalesRollup')
+    line_total = Quantity.objects.filter(order=OuterRef('pk')).order_by().values('order').annotate(
+        total=Sum(F('price') * F('quantity'))
+    ).values('total')
+    total_check = Coalesce(Subquery(line_total), 0)
+    Order.objects.update(total_check=total_check, total_tip=total_check * F('percentage_tip') / 100)
+
+    DailySalesRollup.objects.all().delete()
+    grouped = Order.objects.order_by().values('date_created', 'state', 'waiter_id').annotate(
+        revenue=Sum('total_check'),
+        tips=Sum('total_tip'),
+        order_count=Count('id'),
+    )
+    DailySalesRollup.objects.bulk_create(
+        DailySalesRollup(
+            day=row['date_created'], state=row['state'], waiter_id=row['waiter_id'],
+            revenue=row['revenue'] or 0, tips=row['tips'] or 0, order_count=row['order_count'],
+        )
+        for row in grouped
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('order', '0011_order_quantity_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='quantity',
+            name='price',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(snapshot_prices, migrations.RunPython.noop),
+        migrations.RunPython(recompute_totals, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.1 on 2026-10-18 15:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('order', '0014_order_number_sequence'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['customer_id', 'date_created'], name='order_customer_date_idx'),
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 4.2.1 on 2026-10-18 15:05
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('order', '0015_order_customer_date_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderHistory',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('number', models.IntegerField()),
+                ('table_id', models.IntegerField()),
+                ('customer_id', models.IntegerField()),
+                ('waiter_id', models.IntegerField(default=1)),
+                ('state', models.CharField(choices=[('1', 'ORDERING'), ('2', 'CHECKING'), ('3', 'PAID')], max_length=2)),
+                ('total_check', models.IntegerField(default=0)),
+                ('percentage_tip', models.IntegerField(default=0)),
+                ('total_tip', models.IntegerField(default=0)),
+                ('date_created', models.DateField()),
+                ('date_paid', models.DateField(blank=True, null=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='QuantityHistory',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('quantity', models.IntegerField(default=1)),
+                ('price', models.IntegerField(default=0)),
+                ('order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='order.orderhistory')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='order.product')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='orderhistory',
+            index=models.Index(fields=['date_created'], name='order_history_date_idx'),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 4.2.1 on 2026-10-18 15:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('order', '0016_order_history'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='orderhistory',
+            name='order_history_date_idx',
+        ),
+        migrations.AddIndex(
+            model_name='orderhistory',
+            index=models.Index(fields=['date_created', 'id'], name='order_history_date_id_idx'),
+        ),
+    ]
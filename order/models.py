@@ -1,5 +1,5 @@
 from django.db import models
-from django.db.models import UniqueConstraint
+from django.db.models import Index, UniqueConstraint
 
 class Product(models.Model):
     class Category(models.TextChoices):
@@ -49,6 +49,24 @@ class Order(models.Model):
                 name='unique_order_table_customer'
             )
         ]
+        indexes = [
+            # Date-range reports (OrderFilterView), optionally narrowed by state.
+            Index(fields=['date_created', 'state'], name='order_date_state_idx'),
+            # OrderDeletionService only ever touches PAID orders.
+            Index(
+                fields=['date_created'],
+                condition=models.Q(state='3'),
+                name='order_paid_date_idx'
+            ),
+            # Open tabs for a table (state IN ORDERING, CHECKING). Kept
+            # non-partial: planners cannot match an IN list against a
+            # partial index predicate.
+            Index(fields=['table_id', 'state'], name='order_table_state_idx'),
+            Index(fields=['waiter_id', 'date_created'], name='order_waiter_date_idx'),
+            # OrderViewSet ?customer_id= pages, in (date_created, id) order.
+            # The state, table and waiter filters use the indexes above.
+            Index(fields=['customer_id', 'date_created'], name='order_customer_date_idx'),
+        ]
 
     def __str__(self):
         return str(self.number)
@@ -57,6 +75,92 @@ class Quantity(models.Model):
     order = models.ForeignKey(Order, on_delete=models.CASCADE)
     product = models.ForeignKey(Product, on_delete=models.CASCADE)
     quantity = models.IntegerField(default=1)
+    # Product price when the line was added; later menu price changes do
+    # not rewrite existing checks.
+    price = models.IntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            Index(fields=['order', 'product'], name='quantity_order_product_idx'),
+        ]
+
+    def __str__(self):
+        return str(self.quantity)
+
+class DailySalesRollup(models.Model):
+    day = models.DateField()
+    state = models.CharField(max_length=2, choices=Order.State.choices)
+    waiter_id = models.IntegerField()
+    revenue = models.IntegerField(default=0)
+    tips = models.IntegerField(default=0)
+    order_count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            UniqueConstraint(
+                fields=['day', 'state', 'waiter_id'],
+                name='unique_daily_sales_rollup'
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.day} {self.state} {self.waiter_id}"
+
+
+class OrderChange(models.Model):
+    class Kind(models.TextChoices):
+        ORDER = "order", "ORDER"
+        QUANTITY = "quantity", "QUANTITY"
+
+    kind = models.CharField(max_length=10, choices=Kind.choices)
+    object_id = models.BigIntegerField()
+    deleted = models.BooleanField(default=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.kind} {self.object_id}"
+
+
+class OrderNumberSequence(models.Model):
+    # Next order number to hand out for the day; workers reserve blocks of
+    # numbers from it (order.numbers).
+    day = models.DateField(unique=True)
+    next_number = models.IntegerField(default=1)
+
+    def __str__(self):
+        return f"{self.day} {self.next_number}"
+
+
+class OrderHistory(models.Model):
+    # PAID orders moved out of Order by order.history.archive_paid_orders.
+    # Same columns and ids as Order, so the two can be read as one.
+    id = models.BigIntegerField(primary_key=True)
+    number = models.IntegerField()
+    table_id = models.IntegerField()
+    customer_id = models.IntegerField()
+    waiter_id = models.IntegerField(default=1)
+    state = models.CharField(max_length=2, choices=Order.State.choices)
+    total_check = models.IntegerField(default=0)
+    percentage_tip = models.IntegerField(default=0)
+    total_tip = models.IntegerField(default=0)
+    date_created = models.DateField()
+    date_paid = models.DateField(blank=True, null=True)
+
+    class Meta:
+        indexes = [
+            Index(fields=['date_created', 'id'], name='order_history_date_id_idx'),
+        ]
+
+    def __str__(self):
+        return str(self.number)
+
+
+class QuantityHistory(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    order = models.ForeignKey(OrderHistory, on_delete=models.CASCADE)
+    product = models.ForeignKey(Product, on_delete=models.CASCADE)
+    quantity = models.IntegerField(default=1)
+    price = models.IntegerField(default=0)
 
     def __str__(self):
-        return str(self.quantity)
\ No newline at end of file
+        return str(self.quantity)
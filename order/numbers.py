@@ -0,0 +1,69 @@
+import threading
+from datetime import date
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.db import connection, transaction
+from django.db.models import F
+from django.dispatch import receiver
+
+from .models import OrderNumberSequence
+
+
+def reserve(day, size):
+    """Reserve ``size`` consecutive numbers for ``day``; returns the first."""
+    with transaction.atomic():
+        sequence, _ = OrderNumberSequence.objects.select_for_update().get_or_create(day=day)
+        OrderNumberSequence.objects.filter(pk=sequence.pk).update(next_number=F('next_number') + size)
+    return sequence.next_number
+
+
+class NumberAllocator:
+    """Hands out order numbers from a block reserved per process.
+
+    The sequence row is only locked once per block, so concurrent order
+    creation does not queue on it. Numbers are unique per day but not
+    gapless: a block is lost when its process exits.
+    """
+
+    def __init__(self, block_size):
+        self.block_size = block_size
+        self._lock = threading.Lock()
+        self._day = None
+        self._next = self._end = 0
+
+    def allocate(self, day=None):
+        day = day or date.today()
+        if connection.in_atomic_block:
+            # A block reserved here would roll back with the caller while this
+            # process kept using it, so take a single number in the caller's
+            # transaction instead.
+            return reserve(day, 1)
+        with self._lock:
+            if day != self._day or self._next >= self._end:
+                self._day = day
+                self._next = reserve(day, self.block_size)
+                self._end = self._next + self.block_size
+            number = self._next
+            self._next += 1
+            return number
+
+    def reset(self, block_size=None):
+        with self._lock:
+            self.block_size = block_size or self.block_size
+            self._day = None
+            self._next = self._end = 0
+
+
+allocator = NumberAllocator(settings.ORDER_NUMBER_BLOCK_SIZE)
+
+
+def allocate(day=None):
+    return allocator.allocate(day)
+
+
+@receiver(setting_changed)
+def reset_allocator(setting, **kwargs):
+    # override_settings in tests: start over with the new block size.
+    if setting == 'ORDER_NUMBER_BLOCK_SIZE':
+        allocator.reset(settings.ORDER_NUMBER_BLOCK_SIZE)
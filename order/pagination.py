@@ -0,0 +1,119 @@
+import base64
+from datetime import date
+
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db.models import Q
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(date_created, pk):
+    raw = f'{date_created.isoformat()}:{pk}'.encode()
+    return base64.urlsafe_b64encode(raw).decode()
+
+
+def decode_cursor(cursor):
+    if not isinstance(cursor, str):
+        raise InvalidCursor(cursor)
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode()).decode()
+        day, pk = raw.split(':')
+        return date.fromisoformat(day), int(pk)
+    except (ValueError, UnicodeDecodeError) as exc:
+        raise InvalidCursor(cursor) from exc
+
+
+def cursor_condition(cursor):
+    day, pk = decode_cursor(cursor)
+    return Q(date_created__gt=day) | Q(date_created=day, id__gt=pk)
+
+
+def seek(queryset, keys, position):
+    """Rows strictly after ``position`` in ``keys`` order."""
+    condition = Q()
+    for index in range(len(keys) - 1, -1, -1):
+        step = Q(**{f'{keys[index]}__gt': position[index]})
+        condition = step if index == len(keys) - 1 else step | (Q(**{keys[index]: position[index]}) & condition)
+    return queryset.filter(condition)
+
+
+class KeysetPagination(BasePagination):
+    """Opt-in (``?page_size=``) cursor pagination that never runs COUNT(*).
+
+    Rows are ordered by ``keys``, which must end in a unique column; the
+    cursor is the position of the last row on the page. Without page_size
+    the view answers with the plain, unpaginated list.
+    """
+    keys = ('id',)
+    max_page_size = 1000
+
+    def get_page_size(self, request):
+        page_size = request.query_params.get('page_size')
+        if page_size is None:
+            return None
+        try:
+            page_size = int(page_size)
+        except ValueError:
+            page_size = 0
+        if page_size < 1:
+            raise ValidationError({'page_size': 'page_size must be a positive integer.'})
+        return min(page_size, self.max_page_size)
+
+    def encode(self, position):
+        raw = ':'.join(value.isoformat() if isinstance(value, date) else str(value) for value in position)
+        return base64.urlsafe_b64encode(raw.encode()).decode()
+
+    def decode(self, queryset, cursor):
+        opts = queryset.model._meta
+        try:
+            values = base64.urlsafe_b64decode(cursor.encode()).decode().split(':')
+            if len(values) != len(self.keys):
+                raise ValueError(cursor)
+            return [opts.get_field(key).to_python(value) for key, value in zip(self.keys, values)]
+        except (ValueError, UnicodeDecodeError, DjangoValidationError):
+            raise ValidationError({'cursor': 'Invalid cursor.'})
+
+    def page_queryset(self, queryset, request, page_size):
+        queryset = queryset.order_by(*self.keys)
+        cursor = request.query_params.get('cursor')
+        if cursor:
+            queryset = seek(queryset, self.keys, self.decode(queryset, cursor))
+        # One extra row tells whether there is a next page.
+        return queryset[:page_size + 1]
+
+    def trim(self, rows, page_size, position):
+        self.next_cursor = None
+        if len(rows) > page_size:
+            rows = rows[:page_size]
+            self.next_cursor = self.encode(position(rows[-1]))
+        return rows
+
+    def paginate_queryset(self, queryset, request, view=None):
+        page_size = self.get_page_size(request)
+        if page_size is None:
+            return None
+        rows = list(self.page_queryset(queryset, request, page_size))
+        return self.trim(rows, page_size, lambda row: [getattr(row, key) for key in self.keys])
+
+    def paginate_values(self, queryset, request, columns):
+        """Like paginate_queryset, but rows are values_list() tuples of ``columns``."""
+        page_size = self.get_page_size(request)
+        if page_size is None:
+            return None
+        width = len(columns)
+        rows = list(self.page_queryset(queryset, request, page_size).values_list(*columns, *self.keys))
+        rows = self.trim(rows, page_size, lambda row: row[width:])
+        return [row[:width] for row in rows]
+
+    def get_paginated_response(self, data):
+        return Response({'next_cursor': self.next_cursor, 'results': data})
+
+
+class OrderKeysetPagination(KeysetPagination):
+    # Same order, and the same cursors, as the /api/filter/ pages.
+    keys = ('date_created', 'id')
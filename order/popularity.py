@@ -0,0 +1,130 @@
+import heapq
+import threading
+import time
+from collections import Counter
+from datetime import timedelta
+from operator import itemgetter
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Sum
+from django.utils import timezone
+
+from .history import TABLES
+
+# Window name -> number of days it covers, today included.
+WINDOWS = {
+    'today': 1,
+    '7d': 7,
+    '30d': 30,
+}
+
+HISTORY_DAYS = max(WINDOWS.values())
+
+
+class PopularityRanking:
+    """Per-product ordered quantities over sliding day windows, kept in memory.
+
+    Line writes feed it increments; every PRODUCT_POPULARITY_RECONCILE_SECONDS
+    the next read rebuilds it from the database with one grouped query, which
+    also folds in other workers' writes. Each process holds its own copy.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # Held across the database read so only one request reconciles.
+        self._reconcile_lock = threading.Lock()
+        self._days = {}
+        self._windows = {name: Counter() for name in WINDOWS}
+        self._today = None
+        self._reconciled_at = None
+
+    def _roll(self, today):
+        # Called with the lock held. On a new day, drop buckets that fell out
+        # of every window and re-sum the windows from what is left.
+        if today == self._today:
+            return
+        self._today = today
+        oldest = today - timedelta(days=HISTORY_DAYS - 1)
+        self._days = {day: counts for day, counts in self._days.items() if day >= oldest}
+        for name, days in WINDOWS.items():
+            window = Counter()
+            start = today - timedelta(days=days - 1)
+            for day, counts in self._days.items():
+                if day >= start:
+                    window.update(counts)
+            self._windows[name] = window
+
+    def add(self, product_id, delta, day=None):
+        today = timezone.localdate()
+        day = day or today
+        with self._lock:
+            self._roll(today)
+            if day < today - timedelta(days=HISTORY_DAYS - 1):
+                return
+            self._days.setdefault(day, Counter())[product_id] += delta
+            for name, days in WINDOWS.items():
+                if day >= today - timedelta(days=days - 1):
+                    self._windows[name][product_id] += delta
+
+    def reconcile(self):
+        today = timezone.localdate()
+        oldest = today - timedelta(days=HISTORY_DAYS - 1)
+        days = {}
+        # Lines can already sit in the history tables (order.history).
+        for _, line_model in TABLES:
+            rows = (
+                line_model.objects.filter(order__date_created__gte=oldest)
+                .values_list('order__date_created', 'product_id')
+                .annotate(total=Sum('quantity'))
+                .order_by()
+            )
+            for day, product_id, total in rows:
+                days.setdefault(day, Counter())[product_id] += total
+        with self._lock:
+            self._days = days
+            self._today = None
+            self._roll(today)
+            self._reconciled_at = time.monotonic()
+
+    def _stale(self):
+        return (
+            self._reconciled_at is None
+            or time.monotonic() - self._reconciled_at > settings.PRODUCT_POPULARITY_RECONCILE_SECONDS
+        )
+
+    def top(self, window, limit):
+        if self._stale():
+            with self._reconcile_lock:
+                # Requests that waited here find it fresh and skip the query.
+                if self._stale():
+                    self.reconcile()
+        with self._lock:
+            self._roll(timezone.localdate())
+            counts = self._windows[window]
+            return [item for item in heapq.nlargest(limit, counts.items(), key=itemgetter(1)) if item[1] > 0]
+
+    def clear(self):
+        with self._lock:
+            self._days = {}
+            self._windows = {name: Counter() for name in WINDOWS}
+            self._today = None
+            self._reconciled_at = None
+
+
+ranking = PopularityRanking()
+
+
+def record(product_quantities):
+    """Count (product_id, quantity_delta, order_day) triples once the
+    transaction commits. Like reconcile(), increments are bucketed by the day
+    the order was created."""
+    product_quantities = [(product_id, delta, day) for product_id, delta, day in product_quantities if delta]
+    if not product_quantities:
+        return
+
+    def apply():
+        for product_id, delta, day in product_quantities:
+            ranking.add(product_id, delta, day)
+
+    transaction.on_commit(apply)
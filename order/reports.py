@@ -0,0 +1,100 @@
+from django.db.models import Count, DateField, F, Sum
+from django.db.models.functions import TruncDay, TruncMonth, TruncWeek
+
+from .history import TABLES
+
+BUCKETS = {
+    'day': TruncDay,
+    'week': TruncWeek,
+    'month': TruncMonth,
+}
+
+GROUPS = {
+    # group name -> (column on Order, column on Quantity)
+    'waiter': ('waiter_id', 'order__waiter_id'),
+    'category': (None, 'product__category'),
+}
+
+# Report columns added up when live and archived rows share a bucket.
+SUMMED = ('revenue', 'tips', 'orders', 'items')
+
+
+def revenue_report(start_date, end_date, bucket='day', group_by=(), states=None):
+    """Revenue, tips, order and item counts per time bucket, computed in SQL.
+
+    Without a category breakdown, revenue/tips/orders come from the order
+    totals and items from the lines, in two grouped queries. With one, every
+    figure comes from the lines in a single query: revenue is price *
+    quantity and tips are each line's share of its order's percentage_tip.
+    Each query is a UNION ALL over the live and history tables
+    (order.history); rows for the same bucket are then added up.
+    """
+    trunc = BUCKETS[bucket]
+    line_keys = ['bucket'] + [GROUPS[group][1] for group in group_by]
+    order_keys = ['bucket'] + [GROUPS[group][0] for group in group_by]
+    lines, orders = [], []
+    for order_model, line_model in TABLES:
+        line_rows = line_model.objects.filter(order__date_created__range=[start_date, end_date])
+        order_rows = order_model.objects.filter(date_created__range=[start_date, end_date])
+        if states:
+            line_rows = line_rows.filter(order__state__in=states)
+            order_rows = order_rows.filter(state__in=states)
+        lines.append(line_rows.annotate(bucket=trunc('order__date_created', output_field=DateField())).values(*line_keys))
+        if 'category' not in group_by:
+            orders.append(order_rows.annotate(bucket=trunc('date_created', output_field=DateField())).values(*order_keys))
+
+    if 'category' in group_by:
+        amount = F('price') * F('quantity')
+        rows = _union([
+            part.annotate(
+                revenue=Sum(amount),
+                tips=Sum(amount * F('order__percentage_tip')) / 100,
+                orders=Count('order', distinct=True),
+                items=Sum('quantity'),
+            ).order_by()
+            for part in lines
+        ])
+        return _merge(_row(row, line_keys, group_by) for row in rows)
+
+    rows = _union([
+        part.annotate(revenue=Sum('total_check'), tips=Sum('total_tip'), orders=Count('id')).order_by()
+        for part in orders
+    ])
+    items = {}
+    for row in _union([part.annotate(items=Sum('quantity')).order_by() for part in lines]):
+        key = tuple(row[key] for key in line_keys)
+        items[key] = items.get(key, 0) + (row['items'] or 0)
+    report = []
+    for row in rows:
+        row['items'] = items.pop(tuple(row[key] for key in order_keys), 0)
+        report.append(_row(row, order_keys, group_by))
+    return _merge(report)
+
+
+def _union(parts):
+    return parts[0].union(*parts[1:], all=True)
+
+
+def _merge(rows):
+    merged = {}
+    for row in rows:
+        key = tuple(value for name, value in row.items() if name not in SUMMED)
+        if key in merged:
+            for name in SUMMED:
+                merged[key][name] += row[name]
+        else:
+            merged[key] = row
+    return [merged[key] for key in sorted(merged)]
+
+
+def _row(row, keys, group_by):
+    data = {'bucket': row['bucket'].isoformat()}
+    for group, key in zip(group_by, keys[1:]):
+        data[group if group == 'category' else 'waiter_id'] = row[key]
+    data.update(
+        revenue=row['revenue'] or 0,
+        tips=row['tips'] or 0,
+        orders=row['orders'],
+        items=row['items'] or 0,
+    )
+    return data
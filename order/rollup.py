@@ -0,0 +1,128 @@
+from collections import defaultdict
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+
+from .history import TABLES
+from .models import DailySalesRollup, Order
+
+# Order columns that decide which rollup row an order lands in and how much
+# it contributes to it.
+TRACKED_FIELDS = ('date_created', 'state', 'waiter_id', 'total_check', 'total_tip')
+
+
+def snapshot(order):
+    return {field: getattr(order, field) for field in TRACKED_FIELDS}
+
+
+def apply_deltas(deltas):
+    """Apply {(day, state, waiter_id): [revenue, tips, order_count]} deltas."""
+    for (day, state, waiter_id), (revenue, tips, order_count) in deltas.items():
+        if not (revenue or tips or order_count):
+            continue
+        rows = DailySalesRollup.objects.filter(day=day, state=state, waiter_id=waiter_id)
+        changes = {
+            'revenue': F('revenue') + revenue,
+            'tips': F('tips') + tips,
+            'order_count': F('order_count') + order_count,
+        }
+        if not rows.update(**changes):
+            try:
+                with transaction.atomic():
+                    DailySalesRollup.objects.create(
+                        day=day, state=state, waiter_id=waiter_id,
+                        revenue=revenue, tips=tips, order_count=order_count,
+                    )
+            except IntegrityError:
+                # Someone else created the row first; fold into theirs.
+                rows.update(**changes)
+        if order_count < 0:
+            rows.filter(order_count__lte=0).delete()
+
+
+def add_rows(deltas, rows, sign):
+    for row in rows:
+        key = (row['date_created'], row['state'], row['waiter_id'])
+        delta = deltas.setdefault(key, [0, 0, 0])
+        delta[0] += sign * (row['total_check'] or 0)
+        delta[1] += sign * (row['total_tip'] or 0)
+        delta[2] += sign
+    return deltas
+
+
+def record_change(old=None, new=None):
+    deltas = defaultdict(lambda: [0, 0, 0])
+    add_rows(deltas, [old] if old else [], -1)
+    add_rows(deltas, [new] if new else [], 1)
+    apply_deltas(deltas)
+
+
+def record_transition(order_ids, old_state, new_state):
+    """Move orders already updated to ``new_state`` out of ``old_state`` rows."""
+    grouped = Order.objects.filter(pk__in=order_ids).order_by().values('date_created', 'waiter_id').annotate(
+        revenue=Sum('total_check'),
+        tips=Sum('total_tip'),
+        order_count=Count('id'),
+    )
+    deltas = {}
+    for row in grouped:
+        values = [row['revenue'] or 0, row['tips'] or 0, row['order_count']]
+        deltas[(row['date_created'], old_state, row['waiter_id'])] = [-value for value in values]
+        deltas[(row['date_created'], new_state, row['waiter_id'])] = values
+    apply_deltas(deltas)
+
+
+def range_totals(start_date, end_date):
+    return DailySalesRollup.objects.filter(day__range=[start_date, end_date]).aggregate(
+        total_check=Sum('revenue'),
+        total_tip=Sum('tips'),
+    )
+
+
+async def arange_totals(start_date, end_date):
+    return await DailySalesRollup.objects.filter(day__range=[start_date, end_date]).aaggregate(
+        total_check=Sum('revenue'),
+        total_tip=Sum('tips'),
+    )
+
+
+@transaction.atomic
+def rebuild(start_date=None, end_date=None):
+    rollups = DailySalesRollup.objects.all()
+    if start_date:
+        rollups = rollups.filter(day__gte=start_date)
+    if end_date:
+        rollups = rollups.filter(day__lte=end_date)
+    rollups.delete()
+
+    # Live and archived orders both count (order.history).
+    totals = defaultdict(lambda: [0, 0, 0])
+    for order_model, _ in TABLES:
+        orders = order_model.objects.all()
+        if start_date:
+            orders = orders.filter(date_created__gte=start_date)
+        if end_date:
+            orders = orders.filter(date_created__lte=end_date)
+        grouped = orders.order_by().values('date_created', 'state', 'waiter_id').annotate(
+            revenue=Sum('total_check'),
+            tips=Sum('total_tip'),
+            order_count=Count('id'),
+        )
+        for row in grouped:
+            total = totals[(row['date_created'], row['state'], row['waiter_id'])]
+            total[0] += row['revenue'] or 0
+            total[1] += row['tips'] or 0
+            total[2] += row['order_count']
+
+    created = DailySalesRollup.objects.bulk_create(
+        DailySalesRollup(
+            day=day,
+            state=state,
+            waiter_id=waiter_id,
+            revenue=revenue,
+            tips=tips,
+            order_count=order_count,
+        )
+        for (day, state, waiter_id), (revenue, tips, order_count) in totals.items()
+    )
+    return len(created)
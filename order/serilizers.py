@@ -1,4 +1,9 @@
+from collections import Counter
+
+from django.db import IntegrityError, transaction
 from rest_framework import serializers
+from . import bulk, changes, numbers, popularity, totals
+from .exceptions import Conflict
 from .models import Product, Order, Quantity
 
 class ProductSerializer(serializers.ModelSerializer):
@@ -7,11 +12,130 @@ class ProductSerializer(serializers.ModelSerializer):
         fields = '__all__'
 
 class OrderSerializer(serializers.ModelSerializer):
+    # Allocated by the server when left out (order.numbers).
+    number = serializers.IntegerField(required=False)
+
     class Meta:
         model = Order
         fields = '__all__'
+        # Maintained server-side from the order lines (order.totals).
+        read_only_fields = ('total_check', 'total_tip')
+
+    def create(self, validated_data):
+        if 'number' not in validated_data:
+            validated_data['number'] = numbers.allocate()
+        try:
+            with transaction.atomic():
+                return super().create(validated_data)
+        except IntegrityError as error:
+            # Only unique_order_table_customer is a conflict. SQLite does not
+            # name the constraint, so fall back to looking for the open order.
+            if 'unique_order_table_customer' not in str(error) and not self.has_open_order(validated_data):
+                raise
+            raise Conflict('This customer already has an order being placed at this table.')
+
+    @staticmethod
+    def has_open_order(validated_data):
+        if validated_data.get('state', Order.State.ORDERING) != Order.State.ORDERING:
+            return False
+        return Order.objects.filter(
+            table_id=validated_data.get('table_id'),
+            customer_id=validated_data.get('customer_id'),
+            state=Order.State.ORDERING,
+        ).exists()
+
+    def update(self, instance, validated_data):
+        for attr, value in validated_data.items():
+            setattr(instance, attr, value)
+        with transaction.atomic():
+            # Only write the submitted columns so a concurrent line change
+            # to the totals is never overwritten with a stale value.
+            instance.save(update_fields=list(validated_data))
+            if 'percentage_tip' in validated_data:
+                totals.adjust(instance.pk, 0)
+        instance.refresh_from_db(fields=['total_check', 'total_tip'])
+        return instance
 
 class QuantitySerializer(serializers.ModelSerializer):
     class Meta:
         model = Quantity
-        fields = '__all__'
\ No newline at end of file
+        fields = '__all__'
+        read_only_fields = ('price',)
+
+class QuantityDetailSerializer(serializers.ModelSerializer):
+    product = ProductSerializer(read_only=True)
+
+    class Meta:
+        model = Quantity
+        fields = '__all__'
+
+
+class OrderDetailSerializer(serializers.ModelSerializer):
+    lines = QuantityDetailSerializer(source='quantity_set', many=True, read_only=True)
+
+    class Meta:
+        model = Order
+        fields = '__all__'
+
+
+class QuantityLineSerializer(serializers.Serializer):
+    product = serializers.IntegerField()
+    quantity = serializers.IntegerField(default=1, min_value=1)
+
+
+class QuantityBulkSerializer(serializers.Serializer):
+    order = serializers.PrimaryKeyRelatedField(queryset=Order.objects.all())
+    lines = QuantityLineSerializer(many=True, allow_empty=False)
+
+    def validate_lines(self, lines):
+        # One query for every product id instead of one per line.
+        wanted = {line['product'] for line in lines}
+        self.prices = dict(Product.objects.filter(pk__in=wanted).values_list('pk', 'price'))
+        missing = sorted(wanted - set(self.prices))
+        if missing:
+            raise serializers.ValidationError(f'Invalid product ids: {missing}.')
+        return lines
+
+    def create(self, validated_data):
+        order = validated_data['order']
+        with transaction.atomic():
+            lines = Quantity.objects.bulk_create([
+                Quantity(
+                    order=order,
+                    product_id=line['product'],
+                    quantity=line['quantity'],
+                    price=self.prices[line['product']],
+                )
+                for line in validated_data['lines']
+            ])
+            # bulk_create sends no signals, so apply the whole batch at once.
+            totals.adjust(order.pk, sum(line.price * line.quantity for line in lines))
+            changes.record_quantities(line.pk for line in lines)
+            popularity.record((line.product_id, line.quantity, order.date_created) for line in lines)
+        return lines
+
+
+class OrderBulkChangeSerializer(serializers.Serializer):
+    id = serializers.IntegerField()
+    state = serializers.ChoiceField(choices=Order.State.choices, required=False)
+    waiter_id = serializers.IntegerField(required=False)
+    percentage_tip = serializers.IntegerField(min_value=0, required=False)
+
+    def validate(self, attrs):
+        if len(attrs) == 1:
+            raise serializers.ValidationError('Give at least one field to change.')
+        return attrs
+
+
+class OrderBulkSerializer(serializers.Serializer):
+    changes = OrderBulkChangeSerializer(many=True, allow_empty=False, max_length=1000)
+
+    def validate_changes(self, changes):
+        counts = Counter(change['id'] for change in changes)
+        duplicates = sorted(order_id for order_id, count in counts.items() if count > 1)
+        if duplicates:
+            raise serializers.ValidationError(f'Duplicate order ids: {duplicates}.')
+        return changes
+
+    def save(self):
+        return bulk.update_orders(self.validated_data['changes'])
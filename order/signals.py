@@ -0,0 +1,95 @@
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from . import catalog, changes, metrics, popularity, rollup, totals
+from .models import Order, Product, Quantity
+
+
+@receiver(pre_save, sender=Order)
+def remember_rollup_snapshot(sender, instance, raw=False, **kwargs):
+    if raw or instance._state.adding:
+        instance._rollup_old = None
+        return
+    instance._rollup_old = Order.objects.filter(pk=instance.pk).values(*rollup.TRACKED_FIELDS).first()
+
+
+@receiver(post_save, sender=Order)
+def update_rollup_on_save(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    if raw:
+        return
+    old = None if created else getattr(instance, '_rollup_old', None)
+    new = rollup.snapshot(instance)
+    if old and update_fields is not None:
+        # Only the saved columns changed; the rest are whatever the row had.
+        new = {field: new[field] if field in update_fields else old[field] for field in rollup.TRACKED_FIELDS}
+    rollup.record_change(old, new)
+    changes.record_orders([instance.pk])
+
+
+@receiver(post_delete, sender=Order)
+def update_rollup_on_delete(sender, instance, **kwargs):
+    rollup.record_change(rollup.snapshot(instance), None)
+    changes.record_orders([instance.pk], deleted=True)
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def bump_catalog_version(sender, **kwargs):
+    catalog.product_changed()
+
+
+@receiver(pre_save, sender=Quantity)
+def snapshot_line_price(sender, instance, raw=False, **kwargs):
+    instance._totals_old = None
+    if raw:
+        return
+    if not instance._state.adding:
+        instance._totals_old = Quantity.objects.filter(pk=instance.pk).values(
+            'order_id', 'order__date_created', 'product_id', 'price', 'quantity'
+        ).first()
+    old = instance._totals_old
+    if old is None or old['product_id'] != instance.product_id:
+        instance.price = instance.product.price
+
+
+@receiver(post_save, sender=Quantity)
+def update_totals_on_line_save(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    changes.record_quantities([instance.pk])
+    old = getattr(instance, '_totals_old', None)
+    day = instance.order.date_created
+    if old is None:
+        popularity.record([(instance.product_id, instance.quantity, day)])
+    else:
+        popularity.record([
+            (old['product_id'], -old['quantity'], old['order__date_created']),
+            (instance.product_id, instance.quantity, day),
+        ])
+    new_amount = instance.price * instance.quantity
+    if old is None:
+        totals.adjust(instance.order_id, new_amount)
+    elif old['order_id'] != instance.order_id:
+        totals.adjust(old['order_id'], -old['price'] * old['quantity'])
+        totals.adjust(instance.order_id, new_amount)
+    else:
+        delta = new_amount - old['price'] * old['quantity']
+        if delta:
+            totals.adjust(instance.order_id, delta)
+
+
+@receiver(post_delete, sender=Quantity)
+def update_totals_on_line_delete(sender, instance, origin=None, **kwargs):
+    order = origin if isinstance(origin, Order) else instance.order
+    popularity.record([(instance.product_id, -instance.quantity, order.date_created)])
+    # Lines cascading away with their order need no totals or feed updates.
+    if isinstance(origin, Order) or getattr(origin, 'model', None) is Order:
+        return
+    changes.record_quantities([instance.pk], deleted=True)
+    totals.adjust(instance.order_id, -instance.price * instance.quantity)
+
+
+# Server-Timing query counts (order.metrics) for every connection, in
+# whichever thread opens it.
+connection_created.connect(metrics.install_query_counter)
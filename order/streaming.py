@@ -0,0 +1,68 @@
+import json
+from itertools import islice
+
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from rest_framework.utils.encoders import JSONEncoder
+
+_encoder = JSONEncoder(separators=(',', ':'), ensure_ascii=False)
+
+
+def encode(data):
+    return _encoder.encode(data)
+
+
+def iter_chunks(iterable, size):
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def stream_json_list(key, queryset, serializer_class, chunk_size, trailer=None):
+    # Emits {"<key>": [...], **trailer()} piece by piece. Rows are pulled with
+    # QuerySet.iterator() so only one chunk of instances is alive at a time,
+    # and the trailer is evaluated last so it never delays the first byte.
+    yield '{' + json.dumps(key) + ':['
+    first = True
+    for chunk in iter_chunks(queryset.iterator(chunk_size=chunk_size), chunk_size):
+        yield ('' if first else ',') + encode(serializer_class(chunk, many=True).data)[1:-1]
+        first = False
+    yield ']'
+    for name, value in (trailer() if trailer else {}).items():
+        yield ',' + json.dumps(name) + ':' + encode(value)
+    yield '}'
+
+
+def is_asgi(request):
+    return isinstance(getattr(request, '_request', request), ASGIRequest)
+
+
+async def aiter_pieces(pieces, batch_size=500):
+    # Django's ASGI handler reads a sync streaming iterator to the end before
+    # sending anything. Pull it batch_size pieces at a time in the
+    # thread-sensitive executor instead, so open database cursors stay on
+    # one thread and only one batch is held in memory.
+    pieces = iter(pieces)
+    take = sync_to_async(lambda: list(islice(pieces, batch_size)))
+    try:
+        while True:
+            batch = await take()
+            if not batch:
+                return
+            for piece in batch:
+                yield piece
+    finally:
+        if hasattr(pieces, 'close'):
+            await sync_to_async(pieces.close)()
+
+
+def streaming_content(request, pieces):
+    """``pieces`` in the form the request's handler can stream without
+    buffering: as they are under WSGI, as an async iterator under ASGI."""
+    return aiter_pieces(pieces) if is_asgi(request) else pieces
+
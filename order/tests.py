@@ -1,11 +1,43 @@
-from django.test import TestCase
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import IntegrityError, connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import AsyncClient, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
 from rest_framework import status
+from rest_framework.renderers import JSONRenderer
 from rest_framework.test import APIClient
-from datetime import datetime
-from .models import Product, Order, Quantity
+from datetime import date, datetime, timedelta
+import csv
+import gzip
+import json
+from io import StringIO
+import os
+from pathlib import Path
+import shutil
+import subprocess
+import sys
+import tempfile
+from unittest import mock, skipUnless
+from . import catalog, changes, compression, fastpath, history, idempotency, metrics, numbers, popularity, renderers, totals, views
+from .deletion import OrderDeletionService
+from .models import Product, Order, Quantity, DailySalesRollup, OrderChange, OrderNumberSequence, OrderHistory, QuantityHistory
 from .serilizers import ProductSerializer, OrderSerializer, QuantitySerializer
 
+
+def use_archive_dir(test):
+    """Point ORDER_ARCHIVE_DIR at a fresh directory removed after the test."""
+    archive_dir = tempfile.mkdtemp(prefix='waiter-archive-')
+    test.addCleanup(shutil.rmtree, archive_dir, ignore_errors=True)
+    override = override_settings(ORDER_ARCHIVE_DIR=Path(archive_dir))
+    override.enable()
+    test.addCleanup(override.disable)
+
+
 class ProductTests(TestCase):
     def setUp(self):
         self.client = APIClient()
@@ -319,6 +351,7 @@ class OrderFilterViewTests(TestCase):
 class OrderDeleteViewTests(TestCase):
     def setUp(self):
         self.client = APIClient()
+        use_archive_dir(self)
 
     def test_order_delete_view(self):
         Order.objects.create(
@@ -353,3 +386,1434 @@ class OrderDeleteViewTests(TestCase):
 
         self.assertEqual(response.status_code, status.HTTP_200_OK)
 
+class OrderFilterPaginationTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.url = reverse('order-filter')
+        self.today = datetime.now().strftime('%Y-%m-%d')
+        for number in range(5):
+            Order.objects.create(
+                number=number,
+                table_id=number,
+                customer_id=number,
+                state=Order.State.ORDERING,
+                total_check=100,
+                percentage_tip=10,
+                total_tip=10,
+            )
+
+    def test_keyset_pagination_walks_all_orders(self):
+        data = {'start_date': self.today, 'end_date': self.today, 'page_size': 2}
+        response = self.client.post(self.url, data, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['total_check'], 500)
+        seen = [order['number'] for order in response.data['orders']]
+        while response.data['next_cursor']:
+            data['cursor'] = response.data['next_cursor']
+            response = self.client.post(self.url, data, format='json')
+            self.assertNotIn('total_check', response.data)
+            seen += [order['number'] for order in response.data['orders']]
+
+        self.assertEqual(seen, [0, 1, 2, 3, 4])
+
+    def test_invalid_cursor(self):
+        data = {'start_date': self.today, 'end_date': self.today, 'page_size': 2, 'cursor': 'nope'}
+        response = self.client.post(self.url, data, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_non_string_cursor(self):
+        data = {'start_date': self.today, 'end_date': self.today, 'page_size': 2, 'cursor': 5}
+        response = self.client.post(self.url, data, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_chunk_size_is_capped(self):
+        data = {'start_date': self.today, 'end_date': self.today, 'stream': True, 'chunk_size': 10 ** 9}
+        with mock.patch('order.views.stream_json_list', return_value=iter([b'{}'])) as stream:
+            self.client.post(self.url, data, format='json')
+
+        self.assertEqual(stream.call_args.args[3], views.MAX_STREAM_CHUNK_SIZE)
+
+    def test_stream_flag_is_parsed_as_boolean(self):
+        data = {'start_date': self.today, 'end_date': self.today, 'stream': 'false'}
+        self.assertFalse(self.client.post(self.url, data, format='json').streaming)
+
+        data['stream'] = 'maybe'
+        response = self.client.post(self.url, data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_streaming_matches_buffered_response(self):
+        data = {'start_date': self.today, 'end_date': self.today}
+        buffered = self.client.post(self.url, data, format='json').json()
+        data.update({'stream': True, 'chunk_size': 2})
+        response = self.client.post(self.url, data, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        streamed = json.loads(b''.join(response.streaming_content))
+        self.assertEqual(streamed, buffered)
+
+class DailySalesRollupTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+
+    def create_order(self, **kwargs):
+        data = {
+            'number': 1,
+            'table_id': 1,
+            'customer_id': 1,
+            'state': Order.State.ORDERING,
+            'total_check': 100,
+            'percentage_tip': 10,
+            'total_tip': 10,
+        }
+        data.update(kwargs)
+        return Order.objects.create(**data)
+
+    def rollup_rows(self):
+        return list(DailySalesRollup.objects.order_by('state', 'waiter_id').values_list(
+            'state', 'waiter_id', 'revenue', 'tips', 'order_count'
+        ))
+
+    def test_rollup_tracks_order_lifecycle(self):
+        order = self.create_order()
+        self.create_order(customer_id=2, total_check=50, total_tip=5, waiter_id=2)
+        self.assertEqual(self.rollup_rows(), [('1', 1, 100, 10, 1), ('1', 2, 50, 5, 1)])
+
+        order.state = Order.State.PAID
+        order.total_check = 120
+        order.save()
+        self.assertEqual(self.rollup_rows(), [('1', 2, 50, 5, 1), ('3', 1, 120, 10, 1)])
+
+        order.delete()
+        self.assertEqual(self.rollup_rows(), [('1', 2, 50, 5, 1)])
+
+    def test_partial_save_keeps_unsaved_columns(self):
+        order = self.create_order()
+        Order.objects.filter(pk=order.pk).update(total_check=300)
+        order.state = Order.State.CHECKING
+        order.save(update_fields=['state'])
+
+        # The rollup follows the row as saved, not the stale total on the instance.
+        self.assertEqual(self.rollup_rows(), [('2', 1, 300, 10, 1)])
+
+    def test_backfill_command_rebuilds_rollup(self):
+        self.create_order()
+        self.create_order(customer_id=2, state=Order.State.PAID)
+        expected = self.rollup_rows()
+        DailySalesRollup.objects.all().delete()
+
+        call_command('backfill_sales_rollup', stdout=StringIO())
+
+        self.assertEqual(self.rollup_rows(), expected)
+
+    def test_filter_totals_come_from_rollup(self):
+        self.create_order()
+        self.create_order(customer_id=2, total_check=50, total_tip=5)
+        today = datetime.now().strftime('%Y-%m-%d')
+
+        response = self.client.post(reverse('order-filter'), {'start_date': today, 'end_date': today}, format='json')
+
+        self.assertEqual(response.data['total_check'], 150)
+        self.assertEqual(response.data['total_tip'], 15)
+
+class IndexPlanTests(TestCase):
+    def plans(self):
+        start, end = date(2023, 1, 1), date(2023, 2, 1)
+        return [
+            (Order.objects.filter(date_created__range=[start, end]), 'order_date_state_idx'),
+            (Order.objects.filter(date_created__range=[start, end], state=Order.State.PAID), 'order_paid_date_idx'),
+            (Order.objects.filter(table_id=1, state__in=[Order.State.ORDERING, Order.State.CHECKING]), 'order_table_state_idx'),
+            (Order.objects.filter(waiter_id=1, date_created__range=[start, end]), 'order_waiter_date_idx'),
+            (Order.objects.filter(customer_id=1).order_by('date_created', 'id'), 'order_customer_date_idx'),
+            (Quantity.objects.filter(order_id=1, product_id=1), 'quantity_order_product_idx'),
+        ]
+
+    @skipUnless(connection.vendor == 'sqlite', 'SQLite query plans')
+    def test_sqlite_plans_use_indexes(self):
+        for queryset, index in self.plans():
+            with self.subTest(index=index):
+                self.assertIn(f'USING INDEX {index}', queryset.explain())
+
+    @skipUnless(connection.vendor == 'postgresql', 'PostgreSQL query plans')
+    def test_postgresql_plans_use_indexes(self):
+        # An empty test table is always cheapest to scan sequentially, so
+        # take that option away and check the planner can reach the index.
+        with connection.cursor() as cursor:
+            cursor.execute('SET LOCAL enable_seqscan = off')
+        for queryset, index in self.plans():
+            with self.subTest(index=index):
+                self.assertIn(index, queryset.explain())
+
+class OrderDeletionServiceTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.today = datetime.now().strftime('%Y-%m-%d')
+        use_archive_dir(self)
+        product = Product.objects.create(name='Soup', price=10, img='soup.jpg', description='Soup')
+        for number in range(5):
+            order = Order.objects.create(
+                number=number,
+                table_id=number,
+                customer_id=number,
+                state=Order.State.PAID,
+                total_check=10,
+                total_tip=1,
+            )
+            Quantity.objects.create(order=order, product=product, quantity=1)
+        Order.objects.create(number=99, table_id=99, customer_id=99, state=Order.State.ORDERING)
+
+    def archived_orders(self):
+        archive_path, _ = OrderDeletionService.paths(date.today(), date.today())
+        with gzip.open(archive_path, 'rt') as archive:
+            return [json.loads(line) for line in archive]
+
+    def test_endpoint_reports_progress_until_done(self):
+        url = reverse('order-delete')
+        data = {'start_date': self.today, 'end_date': self.today, 'batch_size': 2, 'max_batches': 1}
+
+        response = self.client.post(url, data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(response.data['orders_deleted'], 2)
+        self.assertEqual(response.data['remaining'], 3)
+
+        data['max_batches'] = 2
+        response = self.client.post(url, data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.data['done'])
+        self.assertEqual(response.data['orders_deleted'], 5)
+        self.assertEqual(response.data['lines_deleted'], 5)
+
+        self.assertEqual(list(Order.objects.values_list('number', flat=True)), [99])
+        self.assertFalse(Quantity.objects.exists())
+        archived = self.archived_orders()
+        self.assertEqual([order['number'] for order in archived], [0, 1, 2, 3, 4])
+        self.assertEqual(len(archived[0]['lines']), 1)
+        self.assertFalse(DailySalesRollup.objects.filter(state=Order.State.PAID).exists())
+
+    def test_batch_size_is_capped(self):
+        data = {'start_date': self.today, 'end_date': self.today, 'batch_size': 10 ** 9, 'max_batches': 1}
+        with self.settings(ORDER_DELETE_MAX_BATCH_SIZE=2):
+            response = self.client.post(reverse('order-delete'), data, format='json')
+            self.assertEqual(response.data['orders_deleted'], 2)
+
+            progress = OrderDeletionService.delete_orders(date.today(), date.today(), batch_size=10 ** 9, max_batches=1)
+            self.assertEqual(progress['orders_deleted'], 4)
+
+    def test_resumes_pending_batch_after_interruption(self):
+        start = end = date.today()
+        with mock.patch.object(OrderDeletionService, '_delete', side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                OrderDeletionService.delete_orders(start, end, batch_size=2)
+        self.assertEqual(Order.objects.count(), 6)
+
+        progress = OrderDeletionService.delete_orders(start, end, batch_size=2)
+
+        self.assertTrue(progress['done'])
+        self.assertEqual(progress['orders_deleted'], 5)
+        # The interrupted batch was archived once, not twice.
+        self.assertEqual([order['number'] for order in self.archived_orders()], [0, 1, 2, 3, 4])
+
+    def test_concurrent_run_for_the_same_range_is_refused(self):
+        archive_path, _ = OrderDeletionService.paths(date.today(), date.today())
+        archive_path.parent.mkdir(parents=True, exist_ok=True)
+        with OrderDeletionService._lock(archive_path):
+            response = self.client.post(reverse('order-delete'), {'start_date': self.today, 'end_date': self.today}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(Order.objects.filter(state=Order.State.PAID).count(), 5)
+
+    def test_order_reopened_before_delete_keeps_its_lines(self):
+        start = end = date.today()
+        with mock.patch.object(OrderDeletionService, '_delete', side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                OrderDeletionService.delete_orders(start, end, batch_size=2)
+        Order.objects.filter(number=0).update(state=Order.State.CHECKING)
+
+        progress = OrderDeletionService.delete_orders(start, end, batch_size=2)
+
+        self.assertEqual(progress['orders_deleted'], 4)
+        self.assertEqual(progress['lines_deleted'], 4)
+        self.assertEqual(Quantity.objects.get().order.number, 0)
+
+class ProductCatalogCacheTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        cache.clear()
+        catalog.local_cache.clear()
+        self.product = Product.objects.create(
+            name='Test Product',
+            price=10,
+            img='test.jpg',
+            description='Test description',
+            category=Product.Category.MAIN,
+        )
+
+    def test_conditional_get_skips_database(self):
+        url = reverse('product-list')
+        response = self.client.get(url, HTTP_ACCEPT='application/json')
+        etag = response['ETag']
+
+        with self.assertNumQueries(0):
+            response = self.client.get(url, HTTP_ACCEPT='application/json', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        with self.assertNumQueries(0):
+            response = self.client.get(url, HTTP_ACCEPT='application/json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['ETag'], etag)
+        self.assertEqual(response.json()[0]['name'], 'Test Product')
+
+    def test_if_none_match_compares_whole_tags(self):
+        url = reverse('product-list')
+        etag = self.client.get(url, HTTP_ACCEPT='application/json')['ETag']
+
+        for header, expected in [
+            (f'"other", W/{etag}', status.HTTP_304_NOT_MODIFIED),
+            ('*', status.HTTP_304_NOT_MODIFIED),
+            (f'"x{etag[1:]}', status.HTTP_200_OK),
+            (f'{etag}-stale', status.HTTP_200_OK),
+        ]:
+            with self.subTest(header=header):
+                response = self.client.get(url, HTTP_ACCEPT='application/json', HTTP_IF_NONE_MATCH=header)
+                self.assertEqual(response.status_code, expected)
+
+    def test_product_change_invalidates_list_and_detail(self):
+        list_url = reverse('product-list')
+        detail_url = reverse('product-detail', args=[self.product.id])
+        list_etag = self.client.get(list_url, HTTP_ACCEPT='application/json')['ETag']
+        detail_etag = self.client.get(detail_url, HTTP_ACCEPT='application/json')['ETag']
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product.name = 'Updated Product'
+            self.product.save()
+
+        response = self.client.get(list_url, HTTP_ACCEPT='application/json', HTTP_IF_NONE_MATCH=list_etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()[0]['name'], 'Updated Product')
+        response = self.client.get(detail_url, HTTP_ACCEPT='application/json', HTTP_IF_NONE_MATCH=detail_etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()['name'], 'Updated Product')
+
+class QuantityBulkTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.url = reverse('quantity-bulk')
+        self.order = Order.objects.create(number=1, table_id=1, customer_id=1)
+        self.products = [
+            Product.objects.create(name=f'Dish {n}', price=10, img='dish.jpg', description='Dish')
+            for n in range(3)
+        ]
+
+    def test_bulk_create_lines(self):
+        data = {
+            'order': self.order.id,
+            'lines': [{'product': product.id, 'quantity': n + 1} for n, product in enumerate(self.products)],
+        }
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(self.url, data, format='json')
+        statements = [query['sql'] for query in queries.captured_queries]
+        self.assertEqual(sum(sql.startswith('INSERT INTO "order_quantity"') for sql in statements), 1)
+        self.assertEqual(sum(sql.startswith('SELECT "order_product"') for sql in statements), 1)
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual([line['quantity'] for line in response.data], [1, 2, 3])
+        self.assertTrue(all(line['id'] for line in response.data))
+        self.assertEqual(Quantity.objects.filter(order=self.order).count(), 3)
+
+    def test_unknown_product_creates_nothing(self):
+        data = {
+            'order': self.order.id,
+            'lines': [{'product': self.products[0].id}, {'product': 999999}],
+        }
+        response = self.client.post(self.url, data, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('999999', str(response.data['lines']))
+        self.assertFalse(Quantity.objects.exists())
+
+    def test_quantity_must_be_positive(self):
+        for quantity in (0, -5):
+            with self.subTest(quantity=quantity):
+                data = {'order': self.order.id, 'lines': [{'product': self.products[0].id, 'quantity': quantity}]}
+                response = self.client.post(self.url, data, format='json')
+                self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        self.assertFalse(Quantity.objects.exists())
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.total_check, 0)
+
+class OrderNestedDetailTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.products = [
+            Product.objects.create(name=f'Dish {n}', price=10 + n, img='dish.jpg', description='Dish')
+            for n in range(10)
+        ]
+
+    def create_order(self, lines):
+        order = Order.objects.create(number=1, table_id=lines, customer_id=1)
+        Quantity.objects.bulk_create(
+            Quantity(order=order, product=self.products[n % len(self.products)], quantity=1)
+            for n in range(lines)
+        )
+        return order
+
+    def assert_nested_queries(self, lines):
+        order = self.create_order(lines)
+        url = reverse('order-nested', args=[order.id])
+        with self.assertNumQueries(2):
+            response = self.client.get(url)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['lines']), lines)
+        self.assertEqual(response.data['lines'][0]['product']['name'], 'Dish 0')
+
+    def test_single_line_order(self):
+        self.assert_nested_queries(1)
+
+    def test_large_order(self):
+        self.assert_nested_queries(200)
+
+    def test_missing_order(self):
+        response = self.client.get(reverse('order-nested', args=[999999]))
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_non_numeric_pk_is_not_found(self):
+        response = self.client.get('/api/orders/abc/nested/')
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+class OrderTotalsTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.order = Order.objects.create(number=1, table_id=1, customer_id=1, percentage_tip=10)
+        self.soup = Product.objects.create(name='Soup', price=30, img='soup.jpg', description='Soup')
+        self.steak = Product.objects.create(name='Steak', price=100, img='steak.jpg', description='Steak')
+
+    def assert_totals(self, total_check, total_tip):
+        self.order.refresh_from_db()
+        self.assertEqual((self.order.total_check, self.order.total_tip), (total_check, total_tip))
+
+    def test_line_writes_maintain_totals(self):
+        url = reverse('quantity-list')
+        response = self.client.post(url, {'order': self.order.id, 'product': self.soup.id, 'quantity': 2}, format='json')
+        self.assertEqual(response.data['price'], 30)
+        self.assert_totals(60, 6)
+
+        line_url = reverse('quantity-detail', args=[response.data['id']])
+        self.client.patch(line_url, {'quantity': 3}, format='json')
+        self.assert_totals(90, 9)
+
+        self.client.patch(line_url, {'product': self.steak.id}, format='json')
+        self.assert_totals(300, 30)
+
+        self.client.delete(line_url)
+        self.assert_totals(0, 0)
+
+    def test_price_snapshot_survives_menu_change(self):
+        Quantity.objects.create(order=self.order, product=self.soup, quantity=1)
+        self.soup.price = 50
+        self.soup.save()
+        Quantity.objects.create(order=self.order, product=self.soup, quantity=1)
+
+        self.assert_totals(80, 8)
+
+    def test_bulk_lines_and_tip_change(self):
+        lines = [{'product': self.soup.id, 'quantity': 1}, {'product': self.steak.id, 'quantity': 2}]
+        self.client.post(reverse('quantity-bulk'), {'order': self.order.id, 'lines': lines}, format='json')
+        self.assert_totals(230, 23)
+
+        url = reverse('order-detail', args=[self.order.id])
+        response = self.client.patch(url, {'percentage_tip': 20, 'total_check': 1}, format='json')
+        self.assertEqual((response.data['total_check'], response.data['total_tip']), (230, 46))
+        self.assert_totals(230, 46)
+        self.assertEqual(DailySalesRollup.objects.get().tips, 46)
+
+    def test_repair_command(self):
+        Quantity.objects.create(order=self.order, product=self.steak, quantity=1)
+        Order.objects.filter(pk=self.order.pk).update(total_check=5, total_tip=5)
+
+        call_command('recompute_order_totals', stdout=StringIO())
+
+        self.assert_totals(100, 10)
+        self.assertEqual(DailySalesRollup.objects.get().revenue, 100)
+
+class ValuesListFastPathTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        cache.clear()
+        catalog.local_cache.clear()
+        product = Product.objects.create(name='Crème brûlée', price=12, img='creme.jpg', description='"Classic"')
+        for number in range(3):
+            order = Order.objects.create(number=number, table_id=number, customer_id=number, percentage_tip=10)
+            Quantity.objects.create(order=order, product=product, quantity=number + 1)
+        Order.objects.filter(number=0).update(date_paid=date(2023, 5, 1), state=Order.State.PAID)
+
+    def test_list_responses_are_byte_identical(self):
+        for name in ('product-list', 'order-list', 'quantity-list'):
+            with self.subTest(route=name):
+                with self.settings(ORDER_API_VALUES_LISTS=False):
+                    expected = self.client.get(reverse(name), HTTP_ACCEPT='application/json').content
+                cache.clear()
+                catalog.local_cache.clear()
+                with self.settings(ORDER_API_VALUES_LISTS=True):
+                    actual = self.client.get(reverse(name), HTTP_ACCEPT='application/json').content
+
+                self.assertEqual(actual, expected)
+
+    def test_compiled_plan_follows_serializer_field_order(self):
+        for serializer_class in (ProductSerializer, OrderSerializer):
+            self.assertIsNotNone(fastpath.compile_serializer(serializer_class))
+        names, columns, _ = fastpath.compile_serializer(QuantitySerializer)
+
+        self.assertEqual(names, tuple(QuantitySerializer().fields))
+        self.assertEqual(columns, ('id', 'quantity', 'price', 'order_id', 'product_id'))
+
+class AsyncReadEndpointTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.async_client = AsyncClient()
+        cache.clear()
+        catalog.local_cache.clear()
+        self.product = Product.objects.create(name='Soup', price=10, img='soup.jpg', description='Soup')
+        self.orders = [
+            Order.objects.create(number=number, table_id=number, customer_id=number, total_check=10, total_tip=1)
+            for number in range(3)
+        ]
+
+    async def test_reads_match_sync_endpoints(self):
+        routes = [
+            ('product-list', 'async-product-list', []),
+            ('product-detail', 'async-product-detail', [self.product.id]),
+            ('order-list', 'async-order-list', []),
+            ('order-detail', 'async-order-detail', [self.orders[0].id]),
+        ]
+        for sync_name, async_name, args in routes:
+            with self.subTest(route=async_name):
+                expected = await sync_to_async(self.client.get)(reverse(sync_name, args=args), HTTP_ACCEPT='application/json')
+                response = await self.async_client.get(reverse(async_name, args=args))
+
+                self.assertEqual(response.status_code, status.HTTP_200_OK)
+                self.assertEqual(response.content, expected.content)
+
+    async def test_missing_detail(self):
+        response = await self.async_client.get(reverse('async-order-detail', args=[999999]))
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    async def test_filter_pages_match_sync_filter(self):
+        today = datetime.now().strftime('%Y-%m-%d')
+        data = {'start_date': today, 'end_date': today, 'page_size': 2}
+        expected = await sync_to_async(self.client.post)(reverse('order-filter'), data, format='json')
+        response = await self.async_client.post(reverse('async-order-filter'), data, content_type='application/json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json(), expected.json())
+        self.assertEqual(response.json()['total_check'], 30)
+
+    async def test_filter_requires_dates(self):
+        response = await self.async_client.post(reverse('async-order-filter'), {}, content_type='application/json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+class ServerTimingMiddlewareTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        metrics.histogram.clear()
+        Order.objects.create(number=1, table_id=1, customer_id=1)
+
+    def test_server_timing_header(self):
+        response = self.client.get(reverse('order-list'), HTTP_ACCEPT='application/json')
+
+        header = response['Server-Timing']
+        self.assertIn('db;dur=', header)
+        self.assertIn('desc="1 queries"', header)
+        self.assertIn('render;dur=', header)
+        self.assertIn('view;dur=', header)
+
+    def test_metrics_endpoint_reports_route_percentiles(self):
+        for _ in range(3):
+            self.client.get(reverse('order-list'), HTTP_ACCEPT='application/json')
+
+        response = self.client.get(reverse('metrics'), HTTP_ACCEPT='application/json')
+
+        route = response.json()['order-list']
+        self.assertEqual(route['count'], 3)
+        self.assertEqual(route['queries']['p99'], 1)
+        self.assertGreater(route['total_ms']['p50'], 0)
+
+    def test_query_budget_warning(self):
+        with self.settings(ORDER_QUERY_BUDGETS={'order-list': 0}):
+            with self.assertLogs('order.metrics', level='WARNING') as logs:
+                self.client.get(reverse('order-list'), HTTP_ACCEPT='application/json')
+
+        self.assertIn('over its budget of 0', logs.output[0])
+
+    def test_async_capable(self):
+        async def get_response(request):
+            return None
+
+        self.assertTrue(iscoroutinefunction(metrics.ServerTimingMiddleware(get_response)))
+        self.assertFalse(iscoroutinefunction(metrics.ServerTimingMiddleware(lambda request: None)))
+
+    async def test_async_route_counts_queries_from_worker_threads(self):
+        order = await Order.objects.afirst()
+        response = await AsyncClient().get(reverse('async-order-detail', args=[order.id]))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('desc="1 queries"', response['Server-Timing'])
+
+    def test_streamed_body_queries_are_recorded(self):
+        today = date.today().isoformat()
+        data = {'start_date': today, 'end_date': today, 'stream': True, 'chunk_size': 1}
+        response = self.client.post(reverse('order-filter'), data, format='json')
+        b''.join(response.streaming_content)
+        response.close()
+
+        route = metrics.histogram.summary()['order-filter']
+        self.assertEqual(route['count'], 1)
+        self.assertGreater(route['queries']['p99'], 0)
+
+class ApiOnlyProfileTests(TestCase):
+    # Runs under waiter.settings_api in a fresh process, so the reduced
+    # INSTALLED_APPS is what Django actually loads. Only the database is
+    # swapped for in-memory SQLite before setup.
+    PROFILE_PROBE = """
+import json, django, waiter.settings_api as profile
+profile.DATABASES = {'default': {'ENGINE': 'django.db.backends.sqlite3', 'NAME': ':memory:'}}
+django.setup()
+from django.apps import apps
+from django.core.management import call_command
+from django.test import Client
+from django.test.utils import setup_test_environment
+call_command('check', fail_level='WARNING')
+setup_test_environment()
+call_command('migrate', verbosity=0)
+client = Client()
+response = client.post('/api/orders/', {'number': 1, 'table_id': 1, 'customer_id': 1}, content_type='application/json')
+print(json.dumps({
+    'apps': [app.label for app in apps.get_app_configs()],
+    'status': response.status_code,
+    'content_type': response['Content-Type'],
+    'admin': client.get('/admin/').status_code,
+}))
+"""
+
+    def test_order_api_without_admin_sessions_or_templates(self):
+        env = dict(os.environ, DJANGO_SETTINGS_MODULE='waiter.settings_api')
+        output = subprocess.check_output(
+            [sys.executable, '-c', self.PROFILE_PROBE], env=env, cwd=settings.BASE_DIR, text=True, stderr=subprocess.STDOUT,
+        )
+        result = json.loads(output.strip().splitlines()[-1])
+
+        self.assertEqual(result['apps'], ['order'])
+        self.assertEqual(result['status'], status.HTTP_201_CREATED)
+        self.assertEqual(result['content_type'], 'application/json')
+        self.assertEqual(result['admin'], status.HTTP_404_NOT_FOUND)
+
+    def test_lazy_entry_point_defers_django_import(self):
+        probe = 'import sys, waiter.wsgi_api; print(any(name.startswith("django") for name in sys.modules))'
+        output = subprocess.check_output([sys.executable, '-c', probe], cwd=settings.BASE_DIR, text=True)
+
+        self.assertEqual(output.strip(), 'False')
+
+@override_settings(ORDER_CHANGES_SETTLE_SECONDS=0)
+class OrderChangeFeedTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.url = reverse('order-changes')
+        self.product = Product.objects.create(name='Soup', price=10, img='soup.jpg', description='Soup')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.open_order = Order.objects.create(number=1, table_id=1, customer_id=1)
+            Order.objects.create(number=2, table_id=2, customer_id=2, state=Order.State.PAID)
+
+    def test_snapshot_then_incremental_changes(self):
+        response = self.client.get(self.url, {'state': '1,2'}, HTTP_ACCEPT='application/json')
+        self.assertEqual([order['number'] for order in response.data['orders']], [1])
+        cursor = response.data['cursor']
+
+        response = self.client.get(self.url, {'cursor': cursor}, HTTP_ACCEPT='application/json')
+        self.assertEqual(response.data['orders'], [])
+        self.assertEqual(response.data['cursor'], cursor)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            line = Quantity.objects.create(order=self.open_order, product=self.product, quantity=2)
+        response = self.client.get(self.url, {'cursor': cursor, 'state': '1,2'}, HTTP_ACCEPT='application/json')
+        self.assertEqual([quantity['id'] for quantity in response.data['quantities']], [line.id])
+        self.assertEqual(response.data['orders'][0]['total_check'], 20)
+        cursor = response.data['cursor']
+
+        order_id = self.open_order.id
+        with self.captureOnCommitCallbacks(execute=True):
+            self.open_order.delete()
+        response = self.client.get(self.url, {'cursor': cursor}, HTTP_ACCEPT='application/json')
+        self.assertEqual(response.data['deleted']['orders'], [order_id])
+
+    def test_open_orders_by_default(self):
+        response = self.client.get(self.url, HTTP_ACCEPT='application/json')
+        self.assertEqual([order['number'] for order in response.data['orders']], [1])
+
+        response = self.client.get(self.url, {'state': '3'}, HTTP_ACCEPT='application/json')
+        self.assertEqual([order['number'] for order in response.data['orders']], [2])
+
+    def test_unknown_state(self):
+        response = self.client.get(self.url, {'state': '1,PAID'}, HTTP_ACCEPT='application/json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_long_poll_times_out_empty(self):
+        cursor = changes.head()
+        with self.settings(ORDER_CHANGES_POLL_INTERVAL=0.05):
+            response = self.client.get(self.url, {'cursor': cursor, 'wait': 0.1}, HTTP_ACCEPT='application/json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['orders'], [])
+
+    def test_rejects_non_finite_or_negative_wait(self):
+        for wait in ('nan', 'inf', '-1'):
+            with self.subTest(wait=wait):
+                response = self.client.get(self.url, {'wait': wait}, HTTP_ACCEPT='application/json')
+                self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_expired_cursor(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Order.objects.create(number=3, table_id=3, customer_id=3)
+        OrderChange.objects.filter(id__lt=changes.head()).delete()
+
+        response = self.client.get(self.url, {'cursor': 0}, HTTP_ACCEPT='application/json')
+
+        self.assertEqual(response.status_code, status.HTTP_410_GONE)
+
+    def test_server_sent_events_are_not_held_back_by_gzip(self):
+        with self.settings(ORDER_CHANGES_STREAM_SECONDS=60, ORDER_CHANGES_HEARTBEAT=60):
+            response = self.client.get(self.url, HTTP_ACCEPT='text/event-stream', HTTP_ACCEPT_ENCODING='gzip')
+            # The snapshot arrives while the stream is still open.
+            first = next(iter(response.streaming_content))
+            response.close()
+
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertTrue(first.startswith(b'id: '))
+
+    async def test_server_sent_events_under_asgi(self):
+        with self.settings(ORDER_CHANGES_STREAM_SECONDS=60, ORDER_CHANGES_HEARTBEAT=60):
+            response = await AsyncClient().get(self.url, headers={'Accept': 'text/event-stream'})
+            self.assertTrue(response.is_async)
+            first = await response.streaming_content.__anext__()
+            await response.streaming_content.aclose()
+
+        self.assertTrue(first.startswith(b'id: '))
+        self.assertIn(b'event: snapshot', first)
+
+    def test_server_sent_events(self):
+        with self.settings(ORDER_CHANGES_STREAM_SECONDS=0):
+            response = self.client.get(self.url, {'state': '1'}, HTTP_ACCEPT='text/event-stream')
+            body = b''.join(response.streaming_content).decode()
+
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        self.assertTrue(body.startswith(f'id: {changes.head()}\nevent: snapshot\ndata: '))
+        self.assertEqual(json.loads(body.split('data: ', 1)[1])['orders'][0]['number'], 1)
+
+class TableCheckTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.url = reverse('table-check', args=[7])
+        soup = Product.objects.create(name='Soup', price=30, img='soup.jpg', description='Soup')
+        steak = Product.objects.create(name='Steak', price=100, img='steak.jpg', description='Steak')
+        first = Order.objects.create(number=1, table_id=7, customer_id=1, percentage_tip=10)
+        second = Order.objects.create(number=2, table_id=7, customer_id=2, percentage_tip=20)
+        Order.objects.create(number=3, table_id=7, customer_id=3)
+        Order.objects.create(number=4, table_id=7, customer_id=1, state=Order.State.PAID, total_check=999)
+        Order.objects.create(number=5, table_id=8, customer_id=1)
+        Quantity.objects.create(order=first, product=soup, quantity=2)
+        Quantity.objects.create(order=first, product=steak, quantity=1)
+        Quantity.objects.create(order=second, product=steak, quantity=1)
+
+    def test_split_check_in_one_query(self):
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url, HTTP_ACCEPT='application/json')
+
+        customers = {customer['customer_id']: customer for customer in response.data['customers']}
+        self.assertEqual(set(customers), {1, 2, 3})
+        self.assertEqual((customers[1]['subtotal'], customers[1]['tip'], customers[1]['total']), (160, 16, 176))
+        self.assertEqual((customers[2]['subtotal'], customers[2]['tip'], customers[2]['total']), (100, 20, 120))
+        self.assertEqual(customers[3]['total'], 0)
+        self.assertEqual(response.data['total'], 296)
+        self.assertFalse(Order.objects.filter(table_id=7, state=Order.State.CHECKING).exists())
+
+    def test_request_check_moves_orders_to_checking(self):
+        response = self.client.post(self.url, format='json')
+
+        self.assertEqual(response.data['total'], 296)
+        self.assertEqual(Order.objects.filter(table_id=7, state=Order.State.CHECKING).count(), 3)
+        self.assertEqual(Order.objects.get(table_id=8).state, Order.State.ORDERING)
+        checking = DailySalesRollup.objects.get(state=Order.State.CHECKING)
+        self.assertEqual((checking.revenue, checking.order_count), (260, 3))
+        self.assertEqual(DailySalesRollup.objects.get(state=Order.State.ORDERING).order_count, 1)
+
+class RevenueReportTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.url = reverse('revenue-report')
+        soup = Product.objects.create(
+            name='Soup', price=30, img='soup.jpg', description='Soup', category=Product.Category.STARTER
+        )
+        steak = Product.objects.create(
+            name='Steak', price=100, img='steak.jpg', description='Steak', category=Product.Category.MAIN
+        )
+        days = [date(2023, 5, 1), date(2023, 5, 1), date(2023, 5, 20), date(2023, 6, 2)]
+        for number, day in enumerate(days):
+            order = Order.objects.create(
+                number=number, table_id=number, customer_id=number, waiter_id=number % 2 + 1, percentage_tip=10
+            )
+            Quantity.objects.create(order=order, product=soup, quantity=1)
+            Quantity.objects.create(order=order, product=steak, quantity=2)
+            Order.objects.filter(pk=order.pk).update(date_created=day)
+
+    def get(self, **params):
+        params.update(start_date='2023-05-01', end_date='2023-06-30')
+        return self.client.get(self.url, params, HTTP_ACCEPT='application/json')
+
+    def test_monthly_totals(self):
+        with self.assertNumQueries(2):
+            response = self.get(bucket='month')
+
+        self.assertEqual(response.data['rows'], [
+            {'bucket': '2023-05-01', 'revenue': 690, 'tips': 69, 'orders': 3, 'items': 9},
+            {'bucket': '2023-06-01', 'revenue': 230, 'tips': 23, 'orders': 1, 'items': 3},
+        ])
+
+    def test_daily_by_waiter(self):
+        response = self.get(bucket='day', group_by='waiter')
+
+        self.assertEqual(
+            [(row['bucket'], row['waiter_id'], row['orders']) for row in response.data['rows']],
+            [('2023-05-01', 1, 1), ('2023-05-01', 2, 1), ('2023-05-20', 1, 1), ('2023-06-02', 2, 1)],
+        )
+
+    def test_monthly_by_category_in_one_query(self):
+        with self.assertNumQueries(1):
+            response = self.get(bucket='month', group_by='category')
+
+        self.assertEqual(response.data['rows'][:2], [
+            {'bucket': '2023-05-01', 'category': '1', 'revenue': 90, 'tips': 9, 'orders': 3, 'items': 3},
+            {'bucket': '2023-05-01', 'category': '2', 'revenue': 600, 'tips': 60, 'orders': 3, 'items': 6},
+        ])
+
+    def test_rejects_unknown_bucket(self):
+        response = self.get(bucket='year')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+class ProductPopularityTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.url = reverse('product-popular')
+        popularity.ranking.clear()
+        self.order = Order.objects.create(number=1, table_id=1, customer_id=1)
+        self.products = [
+            Product.objects.create(name=f'Dish {n}', price=10, img='dish.jpg', description='Dish')
+            for n in range(3)
+        ]
+
+    def add_line(self, product, quantity):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Quantity.objects.create(order=self.order, product=product, quantity=quantity)
+
+    def ranking(self, **params):
+        response = self.client.get(self.url, params, HTTP_ACCEPT='application/json')
+        return [(row['product']['name'], row['count']) for row in response.data]
+
+    def test_ranking_reconciles_then_updates_incrementally(self):
+        self.add_line(self.products[0], 1)
+        self.add_line(self.products[1], 3)
+        self.assertEqual(self.ranking(), [('Dish 1', 3), ('Dish 0', 1)])
+
+        line = self.add_line(self.products[2], 5)
+        # Served from memory: product lookup only, no GROUP BY.
+        with self.assertNumQueries(1):
+            self.assertEqual(self.ranking(limit=2), [('Dish 2', 5), ('Dish 1', 3)])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            line.delete()
+        self.assertEqual(self.ranking(window='today'), [('Dish 1', 3), ('Dish 0', 1)])
+
+    def test_increments_use_the_order_day(self):
+        self.assertEqual(self.ranking(), [])
+        Order.objects.filter(pk=self.order.pk).update(date_created=timezone.localdate() - timedelta(days=3))
+        self.order.refresh_from_db()
+        self.add_line(self.products[0], 2)
+
+        # Same buckets reconcile() would build, before the next reconcile.
+        self.assertEqual(self.ranking(window='today'), [])
+        self.assertEqual(self.ranking(window='7d'), [('Dish 0', 2)])
+
+    def test_windows_slide_over_days(self):
+        ranking = popularity.PopularityRanking()
+        today = timezone.localdate()
+        with self.settings(PRODUCT_POPULARITY_RECONCILE_SECONDS=3600):
+            ranking.reconcile()
+            ranking.add(1, 4, day=today - timedelta(days=10))
+            ranking.add(2, 2, day=today - timedelta(days=3))
+            ranking.add(3, 1)
+
+            self.assertEqual(ranking.top('today', 5), [(3, 1)])
+            self.assertEqual(ranking.top('7d', 5), [(2, 2), (3, 1)])
+            self.assertEqual(ranking.top('30d', 5), [(1, 4), (2, 2), (3, 1)])
+
+    def test_rejects_unknown_window(self):
+        response = self.client.get(self.url, {'window': '1y'}, HTTP_ACCEPT='application/json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+class OrderExportTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.url = reverse('order-export')
+        self.today = datetime.now().strftime('%Y-%m-%d')
+        soup = Product.objects.create(name='Soup, hot', price=30, img='soup.jpg', description='Soup')
+        first = Order.objects.create(number=1, table_id=1, customer_id=1)
+        Order.objects.create(number=2, table_id=2, customer_id=2)
+        Quantity.objects.create(order=first, product=soup, quantity=2)
+        Quantity.objects.create(order=first, product=soup, quantity=1)
+
+    def test_csv_has_a_row_per_line(self):
+        response = self.client.get(self.url, {'start_date': self.today, 'end_date': self.today})
+
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        rows = list(csv.reader(b''.join(response.streaming_content).decode().splitlines()))
+        self.assertEqual(rows[0][:2], ['order_id', 'number'])
+        self.assertEqual([(row[1], row[13], row[15]) for row in rows[1:]], [
+            ('1', 'Soup, hot', '2'), ('1', 'Soup, hot', '1'), ('2', '', ''),
+        ])
+
+    def test_gzipped_jsonl_nests_lines(self):
+        params = {'start_date': self.today, 'end_date': self.today, 'output': 'jsonl', 'gzip': '1'}
+        response = self.client.get(self.url, params)
+
+        self.assertEqual(response['Content-Type'], 'application/gzip')
+        lines = gzip.decompress(b''.join(response.streaming_content)).decode().splitlines()
+        orders = [json.loads(line) for line in lines]
+        self.assertEqual([len(order['lines']) for order in orders], [2, 0])
+        self.assertEqual(orders[0]['lines'][0]['price'], 30)
+
+    def test_command_matches_endpoint(self):
+        out = StringIO()
+        call_command('export_orders', '--start-date', self.today, '--end-date', self.today, '--output-format', 'jsonl', stdout=out)
+        response = self.client.get(self.url, {'start_date': self.today, 'end_date': self.today, 'output': 'jsonl'})
+
+        self.assertEqual(out.getvalue(), b''.join(response.streaming_content).decode())
+
+    async def test_asgi_streams_asynchronously(self):
+        params = {'start_date': self.today, 'end_date': self.today}
+        expected = await sync_to_async(self.client.get)(self.url, params)
+        expected = await sync_to_async(b''.join)(expected.streaming_content)
+
+        response = await AsyncClient().get(self.url, params)
+        self.assertTrue(response.is_async)
+        self.assertEqual(b''.join([chunk async for chunk in response.streaming_content]), expected)
+
+class IdempotencyKeyTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        cache.clear()
+        self.order = Order.objects.create(number=1, table_id=1, customer_id=1)
+        self.product = Product.objects.create(name='Dish', price=10, img='dish.jpg', description='Dish')
+
+    def test_retry_replays_line_creation(self):
+        url = reverse('quantity-list')
+        data = {'order': self.order.id, 'product': self.product.id, 'quantity': 2}
+        first = self.client.post(url, data, format='json', HTTP_IDEMPOTENCY_KEY='line-1')
+        retry = self.client.post(url, data, format='json', HTTP_IDEMPOTENCY_KEY='line-1')
+
+        self.assertEqual(first.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(retry.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(retry.json(), first.json())
+        self.assertEqual(Quantity.objects.count(), 1)
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.total_check, 20)
+
+    def test_reused_key_with_other_body_is_rejected(self):
+        url = reverse('quantity-list')
+        data = {'order': self.order.id, 'product': self.product.id, 'quantity': 2}
+        self.client.post(url, data, format='json', HTTP_IDEMPOTENCY_KEY='line-1')
+        response = self.client.post(url, dict(data, quantity=3), format='json', HTTP_IDEMPOTENCY_KEY='line-1')
+
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(Quantity.objects.count(), 1)
+
+    def test_in_flight_key_is_a_conflict(self):
+        url = reverse('quantity-bulk')
+        data = {'order': self.order.id, 'lines': [{'product': self.product.id}]}
+        # Another worker has claimed the key and not finished yet.
+        with mock.patch('order.idempotency.fingerprint', return_value='same-body'):
+            name = idempotency.cache_key(mock.Mock(path=url, user=None), 'bulk-1')
+            idempotency.store().add(name, {'state': idempotency.PENDING, 'fingerprint': 'same-body'})
+            response = self.client.post(url, data, format='json', HTTP_IDEMPOTENCY_KEY='bulk-1')
+
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertFalse(Quantity.objects.exists())
+
+    def test_duplicate_open_order_is_a_conflict(self):
+        data = {'number': 2, 'table_id': 1, 'customer_id': 1}
+        response = self.client.post(reverse('order-list'), data, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(Order.objects.count(), 1)
+
+    def test_other_integrity_errors_are_not_a_conflict(self):
+        data = {'number': 2, 'table_id': 2, 'customer_id': 2}
+        error = IntegrityError('FOREIGN KEY constraint failed')
+        with mock.patch('rest_framework.serializers.ModelSerializer.create', side_effect=error):
+            with self.assertRaises(IntegrityError):
+                self.client.post(reverse('order-list'), data, format='json')
+
+    def test_order_retry_replays_original_response(self):
+        data = {'number': 2, 'table_id': 2, 'customer_id': 2}
+        first = self.client.post(reverse('order-list'), data, format='json', HTTP_IDEMPOTENCY_KEY='order-2')
+        retry = self.client.post(reverse('order-list'), data, format='json', HTTP_IDEMPOTENCY_KEY='order-2')
+
+        self.assertEqual(retry.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(retry.json()['id'], first.json()['id'])
+        self.assertEqual(Order.objects.count(), 2)
+
+class OrderTransitionTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.order = Order.objects.create(number=1, table_id=1, customer_id=1, total_check=100)
+
+    def test_check_then_pay(self):
+        response = self.client.post(reverse('order-check', args=[self.order.id]))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['state'], Order.State.CHECKING)
+
+        response = self.client.post(reverse('order-pay', args=[self.order.id]))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['state'], Order.State.PAID)
+        self.assertEqual(response.data['date_paid'], date.today().isoformat())
+
+        paid = DailySalesRollup.objects.get(state=Order.State.PAID)
+        self.assertEqual((paid.revenue, paid.order_count), (100, 1))
+        self.assertFalse(DailySalesRollup.objects.exclude(state=Order.State.PAID).exists())
+
+    def test_wrong_state_is_a_conflict(self):
+        response = self.client.post(reverse('order-pay', args=[self.order.id]))
+
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(response.data['state'], Order.State.ORDERING)
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.state, Order.State.ORDERING)
+        self.assertIsNone(self.order.date_paid)
+
+    def test_missing_order(self):
+        response = self.client.post(reverse('order-check', args=[999999]))
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_transition_keeps_concurrent_edits(self):
+        # A tip edit lands after this client last read the order.
+        Order.objects.filter(pk=self.order.id).update(percentage_tip=10)
+        self.client.post(reverse('order-check', args=[self.order.id]))
+
+        self.order.refresh_from_db()
+        self.assertEqual((self.order.state, self.order.percentage_tip), (Order.State.CHECKING, 10))
+
+class OrderNumberTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+
+    def test_numbers_allocated_when_omitted(self):
+        url = reverse('order-list')
+        first = self.client.post(url, {'table_id': 1, 'customer_id': 1}, format='json')
+        second = self.client.post(url, {'table_id': 1, 'customer_id': 2}, format='json')
+
+        self.assertEqual(first.status_code, status.HTTP_201_CREATED)
+        self.assertEqual([first.data['number'], second.data['number']], [1, 2])
+
+    def test_client_number_is_kept(self):
+        response = self.client.post(reverse('order-list'), {'number': 42, 'table_id': 1, 'customer_id': 1}, format='json')
+
+        self.assertEqual(response.data['number'], 42)
+        self.assertFalse(OrderNumberSequence.objects.exists())
+
+class OrderNumberBlockTests(TransactionTestCase):
+    def setUp(self):
+        self.allocator = numbers.NumberAllocator(block_size=5)
+
+    def test_blocks_are_reserved_per_allocator(self):
+        other = numbers.NumberAllocator(block_size=5)
+
+        self.assertEqual([self.allocator.allocate() for _ in range(3)], [1, 2, 3])
+        self.assertEqual(other.allocate(), 6)
+        self.assertEqual([self.allocator.allocate() for _ in range(3)], [4, 5, 11])
+        self.assertEqual(OrderNumberSequence.objects.get().next_number, 16)
+
+    def test_new_day_starts_a_new_sequence(self):
+        today = date.today()
+        self.allocator.allocate(today)
+
+        self.assertEqual(self.allocator.allocate(today + timedelta(days=1)), 1)
+
+    def test_reset_drops_the_rest_of_the_block(self):
+        self.allocator.allocate()
+        self.allocator.reset()
+
+        self.assertEqual(self.allocator.allocate(), 6)
+
+    def test_block_size_follows_settings(self):
+        with override_settings(ORDER_NUMBER_BLOCK_SIZE=2):
+            self.assertEqual([numbers.allocate() for _ in range(3)], [1, 2, 3])
+        self.assertEqual(OrderNumberSequence.objects.get().next_number, 5)
+
+class OrderBulkUpdateTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.url = reverse('order-bulk')
+        self.orders = [
+            Order.objects.create(number=n, table_id=1, customer_id=n, total_check=100, state=Order.State.CHECKING)
+            for n in range(3)
+        ]
+
+    def test_grouped_updates_with_per_id_results(self):
+        data = {'changes': [
+            {'id': self.orders[0].id, 'state': Order.State.PAID},
+            {'id': self.orders[1].id, 'state': Order.State.PAID},
+            {'id': self.orders[2].id, 'waiter_id': 7, 'percentage_tip': 10},
+            {'id': 999999, 'state': Order.State.PAID},
+        ]}
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(self.url, data, format='json')
+        updates = [query['sql'] for query in queries.captured_queries if query['sql'].startswith('UPDATE "order_order"')]
+        # One per distinct change set plus one to re-derive the tips.
+        self.assertEqual(len(updates), 3)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        results = response.data['results']
+        self.assertEqual([result['result'] for result in results], ['updated', 'updated', 'updated', 'not_found'])
+        self.assertEqual(results[0]['order']['date_paid'], date.today().isoformat())
+        self.assertEqual((results[2]['order']['waiter_id'], results[2]['order']['total_tip']), (7, 10))
+        self.assertIsNone(results[3]['order'])
+
+        paid = DailySalesRollup.objects.get(state=Order.State.PAID)
+        self.assertEqual((paid.revenue, paid.order_count), (200, 2))
+        self.assertEqual(DailySalesRollup.objects.get(state=Order.State.CHECKING, waiter_id=7).tips, 10)
+
+    def test_invalid_change_applies_nothing(self):
+        data = {'changes': [
+            {'id': self.orders[0].id, 'state': Order.State.PAID},
+            {'id': self.orders[1].id, 'state': '9'},
+        ]}
+        response = self.client.post(self.url, data, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Order.objects.filter(state=Order.State.PAID).exists())
+
+    def test_state_changes_follow_transitions(self):
+        Order.objects.filter(pk=self.orders[1].pk).update(state=Order.State.PAID, date_paid=date.today())
+        data = {'changes': [
+            {'id': self.orders[0].id, 'state': Order.State.ORDERING, 'waiter_id': 5},
+            {'id': self.orders[1].id, 'state': Order.State.CHECKING},
+            {'id': self.orders[2].id, 'state': Order.State.CHECKING, 'waiter_id': 5},
+        ]}
+        response = self.client.post(self.url, data, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        results = response.data['results']
+        self.assertEqual([result['result'] for result in results], ['conflict', 'conflict', 'updated'])
+        self.assertEqual((results[0]['order']['state'], results[0]['order']['waiter_id']), (Order.State.CHECKING, 1))
+        self.assertEqual(results[1]['order']['state'], Order.State.PAID)
+        self.assertEqual(results[2]['order']['waiter_id'], 5)
+
+    def test_duplicate_ids_are_rejected(self):
+        order_id = self.orders[0].id
+        data = {'changes': [{'id': order_id, 'waiter_id': 2}, {'id': order_id, 'waiter_id': 3}]}
+        response = self.client.post(self.url, data, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+class SparseFieldsetTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        for n in range(3):
+            Product.objects.create(name=f'Dish {n}', price=10 + n, img='dish.jpg', description='A long description')
+
+    def test_fields_narrow_response_and_select(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('product-list'), {'fields': 'name,id'})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()[0], {'id': response.json()[0]['id'], 'name': 'Dish 0'})
+        select = next(query['sql'] for query in queries.captured_queries if query['sql'].startswith('SELECT'))
+        self.assertNotIn('description', select)
+
+    def test_values_list_path_matches_serializer(self):
+        url = reverse('product-list')
+        expected = self.client.get(url, {'fields': 'id,price'}).content
+        with override_settings(ORDER_API_VALUES_LISTS=True):
+            catalog.local_cache.clear()
+            cache.clear()
+            self.assertEqual(self.client.get(url, {'fields': 'id,price'}).content, expected)
+
+    def test_unknown_field(self):
+        response = self.client.get(reverse('product-list'), {'fields': 'name,secret'})
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('secret', str(response.data['fields']))
+
+    def test_column_layout(self):
+        response = self.client.get(reverse('product-list'), {'fields': 'name,price', 'layout': 'columns'})
+
+        self.assertEqual(response.json(), {
+            'columns': ['name', 'price'],
+            'rows': [['Dish 0', 10], ['Dish 1', 11], ['Dish 2', 12]],
+        })
+
+    def test_column_layout_of_a_paginated_response(self):
+        for n in range(3):
+            Order.objects.create(number=n, table_id=n, customer_id=n)
+        response = self.client.get(reverse('order-list'), {'fields': 'number', 'layout': 'columns', 'page_size': 2})
+
+        data = response.json()
+        self.assertIsNotNone(data['next_cursor'])
+        self.assertEqual(data['results'], {'columns': ['number'], 'rows': [[0], [1]]})
+
+class CompactRendererTests(TestCase):
+    def test_output_matches_json_renderer(self):
+        data = [{'id': 1, 'name': 'Caf\u00e9 \u2028', 'day': date(2026, 1, 2), 'at': datetime(2026, 1, 2, 3, 4, 5, 678901)}, None]
+        context = {'request': None}
+
+        self.assertEqual(
+            renderers.CompactJSONRenderer().render(data, 'application/json', context),
+            JSONRenderer().render(data, 'application/json', context),
+        )
+
+    def test_large_lists_are_compressed(self):
+        for n in range(50):
+            Product.objects.create(name=f'Dish {n}', price=10, img='dish.jpg', description='A long description')
+        response = APIClient().get(reverse('product-list'), HTTP_ACCEPT_ENCODING='gzip')
+
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(len(json.loads(gzip.decompress(response.content))), 50)
+
+    @skipUnless(compression.brotli, 'brotli is not installed')
+    def test_brotli_preferred(self):
+        for n in range(50):
+            Product.objects.create(name=f'Dish {n}', price=10, img='dish.jpg', description='A long description')
+        response = APIClient().get(reverse('product-list'), HTTP_ACCEPT_ENCODING='gzip, br')
+
+        self.assertEqual(response['Content-Encoding'], 'br')
+        self.assertEqual(len(json.loads(compression.brotli.decompress(response.content))), 50)
+
+class ViewSetFilterTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.url = reverse('order-list')
+        for n in range(5):
+            Order.objects.create(
+                number=n, table_id=n % 2, customer_id=n, waiter_id=n % 3 + 1,
+                state=Order.State.PAID if n >= 3 else Order.State.ORDERING,
+            )
+        Order.objects.filter(number=0).update(date_created=date(2023, 1, 1))
+
+    def numbers(self, response):
+        data = response.json()
+        return [order['number'] for order in (data['results'] if isinstance(data, dict) else data)]
+
+    def test_filters(self):
+        today = date.today().isoformat()
+        self.assertEqual(self.numbers(self.client.get(self.url, {'state': Order.State.PAID})), [3, 4])
+        self.assertEqual(self.numbers(self.client.get(self.url, {'table_id': 1, 'waiter_id': '2,3'})), [1])
+        self.assertEqual(self.numbers(self.client.get(self.url, {'customer_id': 2})), [2])
+        self.assertEqual(self.numbers(self.client.get(self.url, {'start_date': today})), [1, 2, 3, 4])
+        self.assertEqual(self.numbers(self.client.get(self.url, {'end_date': '2023-06-01'})), [0])
+
+    def test_invalid_filters(self):
+        self.assertEqual(self.client.get(self.url, {'state': '9'}).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.client.get(self.url, {'table_id': 'x'}).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.client.get(self.url, {'start_date': '01/02/2023'}).status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_unpaginated_by_default(self):
+        self.assertIsInstance(self.client.get(self.url).json(), list)
+
+    def walk(self, params):
+        response = self.client.get(self.url, dict(params, page_size=2))
+        pages = [self.numbers(response)]
+        while response.json()['next_cursor']:
+            response = self.client.get(self.url, dict(params, page_size=2, cursor=response.json()['next_cursor']))
+            pages.append(self.numbers(response))
+        return pages
+
+    def test_cursor_pagination_without_count(self):
+        with CaptureQueriesContext(connection) as queries:
+            pages = self.walk({})
+
+        self.assertEqual(pages, [[0, 1], [2, 3], [4]])
+        self.assertFalse(any('COUNT(' in query['sql'] for query in queries.captured_queries))
+
+    @override_settings(ORDER_API_VALUES_LISTS=True)
+    def test_cursor_pagination_on_values_list_path(self):
+        self.assertEqual(self.walk({'state': Order.State.ORDERING}), [[0, 1], [2]])
+        self.assertEqual(self.walk({'fields': 'id,number'}), [[0, 1], [2, 3], [4]])
+
+    def test_invalid_cursor(self):
+        response = self.client.get(self.url, {'page_size': 2, 'cursor': 'nonsense'})
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_quantity_filter_by_order(self):
+        product = Product.objects.create(name='Dish', price=10, img='dish.jpg', description='Dish')
+        first, second = Order.objects.filter(state=Order.State.ORDERING)[:2]
+        for order in (first, second, first):
+            Quantity.objects.create(order=order, product=product)
+
+        response = self.client.get(reverse('quantity-list'), {'order': first.id, 'page_size': 1})
+
+        self.assertEqual([line['order'] for line in response.data['results']], [first.id])
+        response = self.client.get(reverse('quantity-list'), {'order': first.id, 'cursor': response.data['next_cursor'], 'page_size': 1})
+        self.assertEqual([line['order'] for line in response.data['results']], [first.id])
+        self.assertIsNone(response.data['next_cursor'])
+
+class OrderHistoryTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        use_archive_dir(self)
+        self.old_day = date.today() - timedelta(days=60)
+        self.range = {'start_date': self.old_day.isoformat(), 'end_date': date.today().isoformat()}
+        product = Product.objects.create(name='Soup', price=10, img='soup.jpg', description='Soup')
+        for n in range(4):
+            order = Order.objects.create(number=n, table_id=n, customer_id=n, percentage_tip=10)
+            Quantity.objects.create(order=order, product=product, quantity=n + 1)
+        # Orders 0 and 1 are old; only 0 and 2 are paid.
+        Order.objects.filter(number__in=[0, 2]).update(state=Order.State.PAID)
+        Order.objects.filter(number__in=[0, 1]).update(date_created=self.old_day)
+        totals.recompute_all()
+
+    def reads(self):
+        filter_url = reverse('order-filter')
+        return [
+            self.client.post(filter_url, self.range, format='json').content,
+            self.client.post(filter_url, dict(self.range, page_size=3), format='json').content,
+            b''.join(self.client.post(filter_url, dict(self.range, stream=True), format='json').streaming_content),
+            self.client.get(reverse('revenue-report'), dict(self.range, group_by='category')).content,
+            b''.join(self.client.get(reverse('order-export'), dict(self.range, output='jsonl')).streaming_content),
+        ]
+
+    def test_moves_old_paid_orders_only(self):
+        result = history.archive_paid_orders(30)
+
+        self.assertEqual(result, {'orders_moved': 1, 'lines_moved': 1, 'remaining': 0, 'done': True})
+        self.assertEqual(list(OrderHistory.objects.values_list('number', 'total_check')), [(0, 10)])
+        self.assertEqual(QuantityHistory.objects.get().order.number, 0)
+        self.assertEqual(sorted(Order.objects.values_list('number', flat=True)), [1, 2, 3])
+        self.assertEqual(Quantity.objects.count(), 3)
+
+    def test_reads_span_live_and_history(self):
+        rollup_before = sorted(DailySalesRollup.objects.values_list('day', 'state', 'revenue', 'order_count'))
+        before = self.reads()
+        history.archive_paid_orders(30)
+
+        self.assertEqual(self.reads(), before)
+        self.assertEqual(sorted(DailySalesRollup.objects.values_list('day', 'state', 'revenue', 'order_count')), rollup_before)
+
+    def test_pages_limit_each_table(self):
+        history.archive_paid_orders(30)
+        seen, cursor = [], None
+        while True:
+            with CaptureQueriesContext(connection) as queries:
+                page, cursor = history.page_between(self.old_day, date.today(), 1, cursor)
+            self.assertTrue(all('LIMIT 2' in query['sql'] and 'UNION' not in query['sql'] for query in queries))
+            seen += [order['number'] for order in page]
+            if cursor is None:
+                break
+
+        self.assertEqual(seen, [0, 1, 2, 3])
+
+    async def test_async_filter_spans_history(self):
+        await sync_to_async(history.archive_paid_orders)(30)
+        response = await AsyncClient().post(reverse('async-order-filter'), dict(self.range, page_size=3), content_type='application/json')
+
+        self.assertEqual([order['number'] for order in json.loads(response.content)['orders']], [0, 1, 2])
+
+    def test_deletion_covers_history(self):
+        history.archive_paid_orders(30)
+        Order.objects.filter(number=2).update(date_created=self.old_day)
+        totals.recompute_all()
+
+        progress = OrderDeletionService.delete_orders(self.old_day, self.old_day)
+
+        self.assertEqual((progress['orders_deleted'], progress['lines_deleted']), (2, 2))
+        self.assertFalse(OrderHistory.objects.exists())
+        self.assertFalse(DailySalesRollup.objects.filter(state=Order.State.PAID).exists())
+
+    def test_rebuilt_rollup_counts_history(self):
+        history.archive_paid_orders(30)
+        expected = sorted(DailySalesRollup.objects.values_list('day', 'state', 'revenue', 'order_count'))
+        call_command('backfill_sales_rollup', stdout=StringIO())
+
+        self.assertEqual(sorted(DailySalesRollup.objects.values_list('day', 'state', 'revenue', 'order_count')), expected)
+
+    def test_counts_remaining_only_when_stopped_early(self):
+        with CaptureQueriesContext(connection) as queries:
+            history.archive_paid_orders(30)
+        self.assertFalse([query for query in queries if 'COUNT(' in query['sql']])
+
+        Order.objects.filter(number=1).update(state=Order.State.PAID, date_created=self.old_day)
+        Order.objects.filter(number=2).update(state=Order.State.PAID, date_created=self.old_day)
+        result = history.archive_paid_orders(30, batch_size=1, max_batches=1)
+        self.assertEqual((result['remaining'], result['done']), (1, False))
+
+    def test_command(self):
+        out = StringIO()
+        call_command('move_orders_to_history', '--older-than-days', '30', stdout=out)
+
+        self.assertIn('Moved 1 orders and 1 lines to history.', out.getvalue())
+
+class MigrationBackfillTests(TransactionTestCase):
+    def migrate(self, target):
+        executor = MigrationExecutor(connection)
+        executor.migrate([('order', target)])
+        return executor.loader.project_state([('order', target)]).apps
+
+    def setUp(self):
+        self.addCleanup(call_command, 'migrate', 'order', verbosity=0)
+
+    def test_rollup_migration_backfills_existing_orders(self):
+        apps = self.migrate('0009_alter_order_options_and_more')
+        OldOrder = apps.get_model('order', 'Order')
+        for number, state, total in [(1, '3', 100), (2, '3', 50), (3, '1', 30)]:
+            OldOrder.objects.create(
+                number=number, table_id=number, customer_id=number, waiter_id=1,
+                state=state, total_check=total, total_tip=total // 10,
+            )
+
+        apps = self.migrate('0010_daily_sales_rollup')
+
+        rows = apps.get_model('order', 'DailySalesRollup').objects.order_by('state')
+        self.assertEqual(
+            list(rows.values_list('state', 'revenue', 'tips', 'order_count')),
+            [('1', 30, 3, 1), ('3', 150, 15, 2)],
+        )
+
+    def test_price_migration_recomputes_totals_and_rollup(self):
+        apps = self.migrate('0011_order_quantity_indexes')
+        soup = apps.get_model('order', 'Product').objects.create(name='Soup', price=10, img='soup.jpg', description='Soup')
+        order = apps.get_model('order', 'Order').objects.create(
+            number=1, table_id=1, customer_id=1, waiter_id=1, state='3', total_check=999, percentage_tip=10, total_tip=99,
+        )
+        apps.get_model('order', 'Quantity').objects.create(order=order, product=soup, quantity=3)
+        apps.get_model('order', 'DailySalesRollup').objects.create(
+            day=order.date_created, state='3', waiter_id=1, revenue=999, tips=99, order_count=1,
+        )
+
+        apps = self.migrate('0012_quantity_price')
+
+        order = apps.get_model('order', 'Order').objects.get()
+        self.assertEqual((order.total_check, order.total_tip), (30, 3))
+        rollup = apps.get_model('order', 'DailySalesRollup').objects.get()
+        self.assertEqual((rollup.revenue, rollup.tips, rollup.order_count), (30, 3, 1))
+
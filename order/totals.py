@@ -0,0 +1,47 @@
+from django.db import transaction
+from django.db.models import F, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+from . import changes, rollup
+from .models import Order, Quantity
+
+
+def tip_for(total_check, percentage_tip):
+    return total_check * percentage_tip // 100
+
+
+def adjust(order_id, delta):
+    """Add ``delta`` to an order's total_check and re-derive its total_tip.
+
+    The UPDATE uses F() expressions so concurrent line writes on the same
+    order cannot overwrite each other. A ``delta`` of 0 just re-derives the
+    tip, e.g. after percentage_tip changed.
+    """
+    with transaction.atomic():
+        orders = Order.objects.filter(pk=order_id)
+        old = orders.select_for_update().values(*rollup.TRACKED_FIELDS, 'percentage_tip').first()
+        if old is None:
+            return
+        orders.update(
+            total_check=F('total_check') + delta,
+            total_tip=(F('total_check') + delta) * F('percentage_tip') / 100,
+        )
+        new = dict(old, total_check=old['total_check'] + delta)
+        new['total_tip'] = tip_for(new['total_check'], new['percentage_tip'])
+        rollup.record_change(old, new)
+        changes.record_orders([order_id])
+
+
+def recompute_all():
+    """Recompute every order's totals from its lines in a single UPDATE."""
+    line_total = Quantity.objects.filter(order=OuterRef('pk')).order_by().values('order').annotate(
+        total=Sum(F('price') * F('quantity'))
+    ).values('total')
+    total_check = Coalesce(Subquery(line_total), 0)
+    with transaction.atomic():
+        updated = Order.objects.update(
+            total_check=total_check,
+            total_tip=total_check * F('percentage_tip') / 100,
+        )
+        rollup.rebuild()
+    return updated
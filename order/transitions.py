@@ -0,0 +1,46 @@
+from datetime import date
+
+from django.db import transaction
+
+from . import changes, rollup
+from .models import Order
+
+# action -> (state the order must be in, state it moves to)
+TRANSITIONS = {
+    'check': (Order.State.ORDERING, Order.State.CHECKING),
+    'pay': (Order.State.CHECKING, Order.State.PAID),
+}
+
+
+def allowed(state, target):
+    """Whether an order in ``state`` may be set to ``target`` in one step."""
+    return state == target or (state, target) in TRANSITIONS.values()
+
+
+class InvalidTransition(Exception):
+    def __init__(self, action, state):
+        expected = TRANSITIONS[action][0]
+        super().__init__(f'Cannot {action} an order in state {Order.State(state).label}; it must be {expected.label}.')
+        self.state = state
+
+
+def transition(order_id, action):
+    """Move an order along ``TRANSITIONS[action]`` with one conditional UPDATE.
+
+    Only ``state`` (and ``date_paid`` on PAID) is written, so concurrent edits
+    to other columns survive. Raises Order.DoesNotExist or InvalidTransition.
+    """
+    expected, target = TRANSITIONS[action]
+    values = {'state': target}
+    if target == Order.State.PAID:
+        values['date_paid'] = date.today()
+
+    with transaction.atomic():
+        if not Order.objects.filter(pk=order_id, state=expected).update(**values):
+            state = Order.objects.filter(pk=order_id).values_list('state', flat=True).first()
+            if state is None:
+                raise Order.DoesNotExist(order_id)
+            raise InvalidTransition(action, state)
+        rollup.record_transition([order_id], expected, target)
+        changes.record_orders([order_id])
+    return Order.objects.get(pk=order_id)
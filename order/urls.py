@@ -1,6 +1,7 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import ProductViewSet, OrderViewSet, QuanityViewSet, OrderFilterView, OrderDeleteView
+from . import async_views
+from .views import ProductViewSet, OrderViewSet, QuanityViewSet, OrderFilterView, OrderDeleteView, OrderExportView, RevenueReportView, TableCheckView, OrderChangeFeedView, MetricsView
 
 router = DefaultRouter()
 router.register(r'products', ProductViewSet)
@@ -11,4 +12,15 @@ urlpatterns = [
     path('api/', include(router.urls)),
     path('api/filter/', OrderFilterView.as_view(), name='order-filter'),
     path('api/delete/', OrderDeleteView.as_view(), name='order-delete'),
+    path('api/export/', OrderExportView.as_view(), name='order-export'),
+    path('api/reports/revenue/', RevenueReportView.as_view(), name='revenue-report'),
+    path('api/tables/<int:table_id>/check/', TableCheckView.as_view(), name='table-check'),
+    path('api/changes/', OrderChangeFeedView.as_view(), name='order-changes'),
+    path('api/metrics/', MetricsView.as_view(), name='metrics'),
+    # Async read paths; same payloads as the routes above, for ASGI servers.
+    path('api/async/products/', async_views.product_list, name='async-product-list'),
+    path('api/async/products/<int:pk>/', async_views.product_detail, name='async-product-detail'),
+    path('api/async/orders/', async_views.order_list, name='async-order-list'),
+    path('api/async/orders/<int:pk>/', async_views.order_detail, name='async-order-detail'),
+    path('api/async/filter/', async_views.order_filter, name='async-order-filter'),
 ]
@@ -1,22 +1,148 @@
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.fields import BooleanField
+from rest_framework.renderers import JSONRenderer
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.viewsets import ModelViewSet
-from django.db.models import Sum
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db.models import Prefetch
+from django.http import Http404, StreamingHttpResponse
 from datetime import datetime
+import math
+import time
+from . import changes, checks, export, history, popularity, reports, rollup, transitions
+from .catalog import CatalogCacheMixin
+from .deletion import DEFAULT_BATCH_SIZE as DEFAULT_DELETE_BATCH_SIZE, JobInProgress, OrderDeletionService
+from .fastpath import ValuesListMixin
+from .fieldsets import SparseFieldsetMixin
+from .filters import FieldFilterBackend
+from .idempotency import idempotent
+from .metrics import histogram
 from .models import Product, Order, Quantity
-from .serilizers import ProductSerializer, OrderSerializer, QuantitySerializer
+from .pagination import InvalidCursor, KeysetPagination, OrderKeysetPagination
+from .renderers import EventStreamRenderer
+from .serilizers import ProductSerializer, OrderSerializer, QuantitySerializer, QuantityBulkSerializer, OrderDetailSerializer, OrderBulkSerializer
+from .streaming import encode, is_asgi, stream_json_list, streaming_content
 
-class ProductViewSet(ModelViewSet):
+MAX_FILTER_PAGE_SIZE = 1000
+DEFAULT_STREAM_CHUNK_SIZE = 500
+MAX_STREAM_CHUNK_SIZE = 5000
+MAX_POPULAR_LIMIT = 100
+
+def _positive_int(value, maximum=None):
+    value = int(value)
+    if value < 1:
+        raise ValueError(value)
+    return min(value, maximum) if maximum else value
+
+class ProductViewSet(CatalogCacheMixin, SparseFieldsetMixin, ValuesListMixin, ModelViewSet):
     queryset = Product.objects.all()
     serializer_class = ProductSerializer
 
-class OrderViewSet(ModelViewSet):
+    @action(detail=False)
+    def popular(self, request):
+        window = request.query_params.get('window', '7d')
+        if window not in popularity.WINDOWS:
+            return Response({'error': f'window must be one of: {", ".join(popularity.WINDOWS)}.'}, status=400)
+        try:
+            limit = _positive_int(request.query_params.get('limit', 10), MAX_POPULAR_LIMIT)
+        except (TypeError, ValueError):
+            return Response({'error': 'limit must be a positive integer.'}, status=400)
+
+        ranked = popularity.ranking.top(window, limit)
+        products = Product.objects.in_bulk([product_id for product_id, _ in ranked])
+        return Response([
+            {'product': ProductSerializer(products[product_id]).data, 'count': count}
+            for product_id, count in ranked
+            if product_id in products
+        ])
+
+class OrderViewSet(SparseFieldsetMixin, ValuesListMixin, ModelViewSet):
     queryset = Order.objects.all()
     serializer_class = OrderSerializer
+    filter_backends = [FieldFilterBackend]
+    filter_fields = {
+        'state': 'state',
+        'table_id': 'table_id',
+        'customer_id': 'customer_id',
+        'waiter_id': 'waiter_id',
+    }
+    date_filter_field = 'date_created'
+    pagination_class = OrderKeysetPagination
+
+    @idempotent
+    def create(self, request, *args, **kwargs):
+        return super().create(request, *args, **kwargs)
+
+    @action(detail=False, methods=['post'])
+    @idempotent
+    def bulk(self, request):
+        serializer = OrderBulkSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        results = serializer.save()
+        # Conflicting orders come back as they are, so the client sees why.
+        orders = Order.objects.in_bulk([order_id for order_id, result in results.items() if result != 'not_found'])
+        return Response({'results': [
+            {'id': order_id, 'result': result, 'order': OrderSerializer(orders[order_id]).data if order_id in orders else None}
+            for order_id, result in results.items()
+        ]})
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action == 'nested':
+            # The order plus all of its lines and their products in two
+            # queries, however many lines the order has.
+            queryset = queryset.prefetch_related(
+                Prefetch('quantity_set', queryset=Quantity.objects.select_related('product').order_by('id'))
+            )
+        return queryset
+
+    def get_serializer_class(self):
+        if self.action == 'nested':
+            return OrderDetailSerializer
+        return super().get_serializer_class()
 
-class QuanityViewSet(ModelViewSet):
+    @action(detail=True)
+    def nested(self, request, pk=None):
+        return Response(self.get_serializer(self.get_object()).data)
+
+    @action(detail=True, methods=['post'])
+    def check(self, request, pk=None):
+        return self.transition(pk, 'check')
+
+    @action(detail=True, methods=['post'])
+    def pay(self, request, pk=None):
+        return self.transition(pk, 'pay')
+
+    def transition(self, pk, name):
+        try:
+            order = transitions.transition(int(pk), name)
+        except (ValueError, Order.DoesNotExist):
+            raise Http404
+        except transitions.InvalidTransition as error:
+            return Response({'error': str(error), 'state': error.state}, status=409)
+        return Response(OrderSerializer(order).data)
+
+class QuanityViewSet(SparseFieldsetMixin, ValuesListMixin, ModelViewSet):
     queryset = Quantity.objects.all()
     serializer_class = QuantitySerializer
+    filter_backends = [FieldFilterBackend]
+    filter_fields = {'order': 'order', 'product': 'product'}
+    pagination_class = KeysetPagination
+
+    @idempotent
+    def create(self, request, *args, **kwargs):
+        return super().create(request, *args, **kwargs)
+
+    @action(detail=False, methods=['post'])
+    @idempotent
+    def bulk(self, request):
+        serializer = QuantityBulkSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        lines = serializer.save()
+        return Response(QuantitySerializer(lines, many=True).data, status=201)
 
 class OrderFilterView(APIView):
     def post(self, request):
@@ -33,26 +159,56 @@ class OrderFilterView(APIView):
         except ValueError:
             return Response({'error': 'Invalid date format. Please provide dates in the format: YYYY-MM-DD.'}, status=400)
         
-        orders = Order.objects.filter(date_created__range=[start_date, end_date])
-        total_check = orders.aggregate(total_check=Sum('total_check'))['total_check']
-        total_tip = orders.aggregate(total_tip=Sum('total_tip'))['total_tip']
-        
+        # Live orders and those moved to the history tables alike.
+        orders = history.orders_between(start_date, end_date)
+
+        def totals():
+            return rollup.range_totals(start_date, end_date)
+
+        try:
+            stream = BooleanField().to_internal_value(request.data.get('stream', False))
+        except ValidationError:
+            return Response({'error': 'stream must be a boolean.'}, status=400)
+        if stream:
+            try:
+                chunk_size = _positive_int(request.data.get('chunk_size', DEFAULT_STREAM_CHUNK_SIZE), MAX_STREAM_CHUNK_SIZE)
+            except (TypeError, ValueError):
+                return Response({'error': 'chunk_size must be a positive integer.'}, status=400)
+            return StreamingHttpResponse(
+                streaming_content(request, stream_json_list('orders', orders, OrderSerializer, chunk_size, totals)),
+                content_type='application/json',
+            )
+
+        page_size = request.data.get('page_size')
+        if page_size is not None:
+            try:
+                page_size = _positive_int(page_size, MAX_FILTER_PAGE_SIZE)
+            except (TypeError, ValueError):
+                return Response({'error': 'page_size must be a positive integer.'}, status=400)
+            cursor = request.data.get('cursor')
+            try:
+                page, next_cursor = history.page_between(start_date, end_date, page_size, cursor)
+            except InvalidCursor:
+                return Response({'error': 'Invalid cursor.'}, status=400)
+            data = {
+                'orders': OrderSerializer(page, many=True).data,
+                'next_cursor': next_cursor,
+            }
+            # Totals cover the whole range, so only pay for them on the first page.
+            if not cursor:
+                data.update(totals())
+            return Response(data)
+
         serializer = OrderSerializer(orders, many=True)
+        summary = totals()
         data = {
             'orders': serializer.data,
-            'total_check': total_check,
-            'total_tip': total_tip
+            'total_check': summary['total_check'],
+            'total_tip': summary['total_tip']
         }
         
         return Response(data)
     
-class OrderDeletionService:
-    @staticmethod
-    def delete_orders(start_date, end_date):
-        orders = Order.objects.filter(date_created__range=[start_date, end_date], state="3")
-        orders_deleted, _ = orders.delete()
-        return orders_deleted
-
 class OrderDeleteView(APIView):
     def post(self, request):
         start_date = request.data.get('start_date')
@@ -68,8 +224,170 @@ class OrderDeleteView(APIView):
         except ValueError:
             return Response({'error': 'Invalid date format. Please provide dates in the format: YYYY-MM-DD.'}, status=400)
 
-        # Call the OrderDeletionService to delete the orders
-        orders_deleted = OrderDeletionService.delete_orders(start_date, end_date)
+        try:
+            batch_size = _positive_int(request.data.get('batch_size', DEFAULT_DELETE_BATCH_SIZE), settings.ORDER_DELETE_MAX_BATCH_SIZE)
+            max_batches = _positive_int(request.data.get('max_batches', settings.ORDER_DELETE_MAX_BATCHES))
+        except (TypeError, ValueError):
+            return Response({'error': 'batch_size and max_batches must be positive integers.'}, status=400)
+
+        # Call the OrderDeletionService to delete the orders. Each call does a
+        # bounded amount of work; repeat it until the job reports done.
+        try:
+            progress = OrderDeletionService.delete_orders(start_date, end_date, batch_size, max_batches)
+        except JobInProgress:
+            return Response({'error': 'A deletion for this date range is already running.'}, status=409)
+        except OSError:
+            return Response({'error': 'The archive directory (ORDER_ARCHIVE_DIR) is not writable.'}, status=503)
+
+        return Response(progress, status=200 if progress['done'] else 202)
+
+class RevenueReportView(APIView):
+    def get(self, request):
+        start_date = request.query_params.get('start_date')
+        end_date = request.query_params.get('end_date')
+
+        # Perform input validation
+        if not start_date or not end_date:
+            return Response({'error': 'start_date and end_date are required.'}, status=400)
+
+        try:
+            start_date = datetime.strptime(start_date, '%Y-%m-%d')
+            end_date = datetime.strptime(end_date, '%Y-%m-%d')
+        except ValueError:
+            return Response({'error': 'Invalid date format. Please provide dates in the format: YYYY-MM-DD.'}, status=400)
+
+        bucket = request.query_params.get('bucket', 'day')
+        if bucket not in reports.BUCKETS:
+            return Response({'error': f'bucket must be one of: {", ".join(reports.BUCKETS)}.'}, status=400)
+        group_by = [group for group in request.query_params.get('group_by', '').split(',') if group]
+        if any(group not in reports.GROUPS for group in group_by):
+            return Response({'error': f'group_by accepts: {", ".join(reports.GROUPS)}.'}, status=400)
+        states = [state for state in request.query_params.get('state', '').split(',') if state]
+
+        rows = reports.revenue_report(start_date, end_date, bucket, group_by, states)
+        return Response({'bucket': bucket, 'group_by': group_by, 'rows': rows})
+
+class OrderExportView(APIView):
+    def get(self, request):
+        start_date = request.query_params.get('start_date')
+        end_date = request.query_params.get('end_date')
+
+        # Perform input validation
+        if not start_date or not end_date:
+            return Response({'error': 'start_date and end_date are required.'}, status=400)
+
+        try:
+            start_date = datetime.strptime(start_date, '%Y-%m-%d')
+            end_date = datetime.strptime(end_date, '%Y-%m-%d')
+        except ValueError:
+            return Response({'error': 'Invalid date format. Please provide dates in the format: YYYY-MM-DD.'}, status=400)
+
+        output = request.query_params.get('output', 'csv')
+        if output not in export.FORMATS:
+            return Response({'error': f'output must be one of: {", ".join(export.FORMATS)}.'}, status=400)
+        gzip = request.query_params.get('gzip') in ('1', 'true')
+
+        content_type, extension = export.FORMATS[output]
+        filename = f'orders-{start_date:%Y%m%d}-{end_date:%Y%m%d}.{extension}'
+        if gzip:
+            content_type, filename = 'application/gzip', filename + '.gz'
+        response = StreamingHttpResponse(
+            streaming_content(request, export.export(start_date, end_date, output, gzip)), content_type=content_type,
+        )
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
+
+class TableCheckView(APIView):
+    def get(self, request, table_id):
+        return Response(checks.split_check(table_id))
+
+    def post(self, request, table_id):
+        # Asking for the check closes the table's open tabs for ordering.
+        return Response(checks.request_check(table_id))
+
+class OrderChangeFeedView(APIView):
+    renderer_classes = [JSONRenderer, EventStreamRenderer]
+
+    def get(self, request):
+        states = [state for state in request.query_params.get('state', '').split(',') if state]
+        unknown = [state for state in states if state not in Order.State.values]
+        if unknown:
+            return Response({'error': f'Unknown state: {", ".join(unknown)}.'}, status=400)
+        cursor = request.query_params.get('cursor', request.headers.get('Last-Event-ID'))
+        try:
+            wait = float(request.query_params.get('wait', 0))
+            if not math.isfinite(wait) or wait < 0:
+                raise ValueError(wait)
+            wait = min(wait, settings.ORDER_CHANGES_MAX_WAIT)
+            cursor = None if cursor in (None, '') else int(cursor)
+        except ValueError:
+            return Response({'error': 'cursor must be an integer and wait a number of seconds.'}, status=400)
+
+        if request.accepted_renderer.format == 'sse':
+            # Django's ASGI handler reads a sync iterator to the end before
+            # sending anything, so ASGI servers get the async stream.
+            stream = self.async_event_stream if is_asgi(request) else self.event_stream
+            response = StreamingHttpResponse(stream(cursor, states), content_type='text/event-stream')
+            response['Cache-Control'] = 'no-cache'
+            response['X-Accel-Buffering'] = 'no'
+            return response
+
+        if cursor is None:
+            return Response(changes.snapshot(states))
+        try:
+            data = changes.wait_for(cursor, states, timeout=wait)
+        except changes.CursorExpired:
+            return Response({'error': 'cursor has expired; reload without a cursor.'}, status=410)
+        if data is None:
+            data = {'cursor': cursor, 'orders': [], 'quantities': [], 'deleted': {'orders': [], 'quantities': []}}
+        return Response(data)
+
+    @staticmethod
+    def event(name, cursor, data):
+        return f'id: {cursor}\nevent: {name}\ndata: {encode(data)}\n\n'
+
+    @classmethod
+    def event_stream(cls, cursor, states):
+        # One connection lives for ORDER_CHANGES_STREAM_SECONDS; EventSource
+        # reconnects on its own and resumes from Last-Event-ID.
+        deadline = time.monotonic() + settings.ORDER_CHANGES_STREAM_SECONDS
+        if cursor is None:
+            data = changes.snapshot(states)
+            cursor = data['cursor']
+            yield cls.event('snapshot', cursor, data)
+        while time.monotonic() < deadline:
+            try:
+                data = changes.wait_for(cursor, states, timeout=settings.ORDER_CHANGES_HEARTBEAT)
+            except changes.CursorExpired:
+                yield 'event: expired\ndata: {}\n\n'
+                return
+            if data is None:
+                yield ': keepalive\n\n'
+                continue
+            cursor = data['cursor']
+            yield cls.event('changes', cursor, data)
 
-        return Response({'orders_deleted': orders_deleted})
+    @classmethod
+    async def async_event_stream(cls, cursor, states):
+        # event_stream() for ASGI: the database is only touched through
+        # sync_to_async, once per poll.
+        deadline = time.monotonic() + settings.ORDER_CHANGES_STREAM_SECONDS
+        if cursor is None:
+            data = await sync_to_async(changes.snapshot)(states)
+            cursor = data['cursor']
+            yield cls.event('snapshot', cursor, data)
+        while time.monotonic() < deadline:
+            try:
+                data = await changes.await_for(cursor, states, timeout=settings.ORDER_CHANGES_HEARTBEAT)
+            except changes.CursorExpired:
+                yield 'event: expired\ndata: {}\n\n'
+                return
+            if data is None:
+                yield ': keepalive\n\n'
+                continue
+            cursor = data['cursor']
+            yield cls.event('changes', cursor, data)
 
+class MetricsView(APIView):
+    def get(self, request):
+        return Response(histogram.summary())
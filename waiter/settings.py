@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/4.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -42,6 +43,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'order.metrics.ServerTimingMiddleware',
+    'order.compression.CompressionMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -127,3 +130,93 @@ STATIC_URL = 'static/'
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+# Archive-then-delete of PAID orders (order.deletion.OrderDeletionService).
+# The directory holds the archives and the resume checkpoints, so it must be
+# writable and persist between requests; serverless filesystems (Vercel) are
+# neither, so point it at a mounted volume there or run the
+# archive_delete_orders command from a host that has one.
+
+ORDER_ARCHIVE_DIR = Path(os.environ.get('ORDER_ARCHIVE_DIR', BASE_DIR / 'archive'))
+
+ORDER_DELETE_MAX_BATCHES = 20
+
+# Upper bound for a requested batch_size; larger values are clamped.
+ORDER_DELETE_MAX_BATCH_SIZE = 5000
+
+# Product catalog cache (order.catalog). Responses are cached per catalog
+# version in a per-process LRU and in this cache alias; point it at a shared
+# backend (Redis, Memcached) so every worker sees the same version counter.
+
+PRODUCT_CATALOG_CACHE = 'default'
+
+PRODUCT_CATALOG_LRU_SIZE = 256
+
+# Build list responses from QuerySet.values_list() instead of model
+# serializers (order.fastpath). Output is identical; off by default.
+
+ORDER_API_VALUES_LISTS = False
+
+# Per-request instrumentation (order.metrics.ServerTimingMiddleware)
+
+SERVER_TIMING_SAMPLE_SIZE = 1000
+
+# Query budgets keyed by URL name, e.g. {'order-list': 2, 'order-filter': 3}.
+ORDER_QUERY_BUDGETS = {}
+
+ORDER_QUERY_BUDGET_DEFAULT = None
+
+# Open-order change feed (order.changes). Waits and stream lifetimes are in
+# seconds. Changes are only served once ORDER_CHANGES_SETTLE_SECONDS old, so
+# a concurrent commit holding a lower id does not land behind a cursor.
+
+ORDER_CHANGES_PAGE_SIZE = 500
+
+ORDER_CHANGES_SETTLE_SECONDS = 0.1
+
+ORDER_CHANGES_POLL_INTERVAL = 1.0
+
+ORDER_CHANGES_MAX_WAIT = 30
+
+ORDER_CHANGES_HEARTBEAT = 15
+
+ORDER_CHANGES_STREAM_SECONDS = 300
+
+# Most-ordered products (order.popularity): how often each process rebuilds
+# its in-memory ranking from the database, in seconds.
+
+PRODUCT_POPULARITY_RECONCILE_SECONDS = 300
+
+# Idempotency-Key support on create endpoints (order.idempotency). Stored
+# responses expire after ORDER_IDEMPOTENCY_TTL seconds; the in-flight claim
+# after ORDER_IDEMPOTENCY_LOCK_TTL, so a crashed worker cannot wedge a key.
+# The store is bounded by the cache backend's own eviction (MAX_ENTRIES).
+
+ORDER_IDEMPOTENCY_CACHE = 'default'
+
+ORDER_IDEMPOTENCY_TTL = 24 * 60 * 60
+
+ORDER_IDEMPOTENCY_LOCK_TTL = 30
+
+# Server-allocated order numbers (order.numbers): how many numbers each
+# process reserves from the per-day sequence at a time.
+
+ORDER_NUMBER_BLOCK_SIZE = 20
+
+# Responses (order.renderers, order.compression). orjson and brotli are
+# optional: without them rendering falls back to the json module and
+# compression to gzip only.
+
+REST_FRAMEWORK = {
+    'DEFAULT_RENDERER_CLASSES': [
+        'order.renderers.CompactJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+}
+
+ORDER_BROTLI_QUALITY = 5
+
+# Hot/cold split (order.history): PAID orders older than this many days are
+# moved to the history tables by the move_orders_to_history command.
+
+ORDER_HISTORY_AFTER_DAYS = 30
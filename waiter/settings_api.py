@@ -0,0 +1,33 @@
+"""
+API-only settings profile for serverless deployments.
+
+Only what the order API needs is installed: no admin, sessions, messages,
+static files or templates, and a middleware stack without the browser-facing
+layers. Use waiter.settings for the admin and the browsable API.
+"""
+
+from .settings import *
+
+INSTALLED_APPS = [
+    'order',
+]
+
+MIDDLEWARE = [
+    'order.metrics.ServerTimingMiddleware',
+    'order.compression.CompressionMiddleware',
+    'django.middleware.security.SecurityMiddleware',
+    'django.middleware.common.CommonMiddleware',
+]
+
+ROOT_URLCONF = 'waiter.urls_api'
+
+TEMPLATES = []
+
+WSGI_APPLICATION = 'waiter.wsgi_api.application'
+
+REST_FRAMEWORK = {
+    'DEFAULT_AUTHENTICATION_CLASSES': [],
+    'DEFAULT_PERMISSION_CLASSES': ['rest_framework.permissions.AllowAny'],
+    'DEFAULT_RENDERER_CLASSES': ['order.renderers.CompactJSONRenderer'],
+    'UNAUTHENTICATED_USER': None,
+}
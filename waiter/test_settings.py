@@ -7,4 +7,4 @@ DATABASES = {
     }
 }
 
-TEST_RUNNER = 'django.test.runner.DiscoverRunner'
\ No newline at end of file
+TEST_RUNNER = 'django.test.runner.DiscoverRunner'
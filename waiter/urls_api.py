@@ -0,0 +1,6 @@
+"""URL configuration for the API-only profile (waiter.settings_api)."""
+from django.urls import path, include
+
+urlpatterns = [
+    path('', include('order.urls')),
+]
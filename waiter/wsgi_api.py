@@ -0,0 +1,33 @@
+"""
+Lazily initialised WSGI entry point for the API-only profile.
+
+Importing this module only sets the settings module; Django and the order
+app are loaded on the first request. Serverless platforms import the entry
+point during init, so this keeps that step cheap and moves the rest onto a
+path the slim profile keeps short.
+"""
+
+import os
+import threading
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'waiter.settings_api')
+
+_application = None
+_lock = threading.Lock()
+
+
+def get_application():
+    global _application
+    if _application is None:
+        with _lock:
+            if _application is None:
+                from django.core.wsgi import get_wsgi_application
+                _application = get_wsgi_application()
+    return _application
+
+
+def application(environ, start_response):
+    return get_application()(environ, start_response)
+
+
+app = application